@@ -1,3 +1,13 @@
+import hashlib
+import itertools
+import json
+import mmap
+import os
+
+# Cached vocabularies start with this line; change it if the format changes
+CACHE_MAGIC = b"crossword vocabulary 1\n"
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,9 +45,24 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Overlaps(dict):
+    """
+    Overlaps between pairs of variables. Only overlapping pairs are stored;
+    looking up any other pair gives None.
+    """
+
+    def __missing__(self, key):
+        return None
+
+
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, cache=None):
+        """
+        Load the structure and the words. If cache is a directory, the
+        preprocessed vocabulary is stored there and reused by later loads
+        of the same words file (see load_vocabulary).
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -58,8 +83,15 @@ class Crossword():
                 self.structure.append(row)
 
         # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # The vocabulary is grouped by length; a word's ID is its position in
+        # the sorted list of words of its length, so a set of words of one
+        # length is a bitset of IDs (bit k set if word k is in the set)
+        self.vocabulary, self.index = load_vocabulary(words_file, cache)
+        self.words = set().union(*self.vocabulary.values())
+        self.ids = dict()
+        for words in self.vocabulary.values():
+            self.ids.update(zip(words, range(len(words))))
+        self.letters = sorted({letter for _, _, letter in self.index.entries()})
 
         # Determine variable set
         self.variables = set()
@@ -104,30 +136,207 @@ class Crossword():
                             length=length
                         ))
 
+        # Map each cell to the variables through it, as (variable, k)
+        # pairs where the cell holds the variable's kth character
+        self.cell_variables = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                self.cell_variables.setdefault(cell, []).append((var, k))
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored, from the cells shared by two
+        # variables; any other pair is looked up as None
+        self.overlaps = Overlaps()
+        for cell, entries in self.cell_variables.items():
+            for (v1, k1), (v2, k2) in itertools.permutations(entries, 2):
+                self.overlaps[v1, v2] = (k1, k2)
+
+        # Neighbors of each variable, computed once
+        adjacent = {var: set() for var in self.variables}
+        for v1, v2 in self.overlaps:
+            adjacent[v1].add(v2)
+        self.adjacent = {
+            var: frozenset(neighbors) for var, neighbors in adjacent.items()
+        }
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
\ No newline at end of file
+        return self.adjacent[var]
+
+    def matching(self, length, k, letter):
+        """
+        Given a word length, a position and a letter, return the bitset of
+        words of that length whose kth character is letter.
+        """
+        return self.index[length, k, letter]
+
+    def all_words(self, length):
+        """Given a word length, return the bitset of all words of that length."""
+        return (1 << len(self.vocabulary.get(length, ()))) - 1
+
+    def decode(self, length, bits):
+        """Given a word length and a bitset, return the list of its words."""
+        words = self.vocabulary.get(length, ())
+        binary = format(bits, "b")[::-1]
+        result = []
+        k = binary.find("1")
+        while k >= 0:
+            result.append(words[k])
+            k = binary.find("1", k + 1)
+        return result
+
+
+class BitsetIndex(dict):
+    """
+    Index of the vocabulary by letter position: (length, k, letter) maps to
+    the bitset of words of that length whose kth character is letter, and
+    any other key to 0. An index read from a cache file is loaded lazily,
+    one bitset at a time, from the memory-mapped file.
+    """
+
+    def __init__(self, path=None, offsets=None):
+        self.path = path
+        self.offsets = offsets or dict()
+        self.data = None
+
+    def __missing__(self, key):
+        if key not in self.offsets:
+            return 0
+        if self.data is None:
+            with open(self.path, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start, size = self.offsets[key]
+        bits = int.from_bytes(self.data[start:start + size], "little")
+        self[key] = bits
+        return bits
+
+    def entries(self):
+        """Return the set of keys with a bitset, loaded or not."""
+        return set(self).union(self.offsets)
+
+    def __reduce__(self):
+        # Processes that receive a cached index map the file again
+        if self.path is not None:
+            return (BitsetIndex, (self.path, self.offsets))
+        return (BitsetIndex, (), None, None, iter(self.items()))
+
+
+def build_vocabulary(words):
+    """
+    Given an iterable of words, return the vocabulary (a dict from length to
+    the sorted list of words of that length) and its BitsetIndex.
+    """
+    vocabulary = dict()
+    for word in sorted(set(words)):
+        if word:
+            vocabulary.setdefault(len(word), []).append(word)
+
+    index = BitsetIndex()
+    for length, group in vocabulary.items():
+        for k in range(length):
+            bits = dict()
+            for id, word in enumerate(group):
+                if word[k] not in bits:
+                    bits[word[k]] = bytearray((len(group) + 7) // 8)
+                bits[word[k]][id >> 3] |= 1 << (id & 7)
+            for letter, array in bits.items():
+                index[length, k, letter] = int.from_bytes(array, "little")
+    return vocabulary, index
+
+
+def write_vocabulary(path, vocabulary, index):
+    """
+    Write a vocabulary and its index to a cache file: CACHE_MAGIC, then the
+    length of a JSON header as 8 bytes (little-endian), the header, and the
+    data. The header gives the offset and size in the data of each length's
+    words (UTF-8, one per line) and of each index bitset (little-endian).
+    """
+    chunks = []
+    size = 0
+
+    def append(data):
+        nonlocal size
+        chunks.append(data)
+        size += len(data)
+        return [size - len(data), len(data)]
+
+    header = {"words": [], "index": []}
+    for length, group in vocabulary.items():
+        header["words"].append([length, *append("\n".join(group).encode())])
+    for (length, k, letter), bits in index.items():
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        header["index"].append([length, k, letter, *append(data)])
+
+    # The header's own size shifts the data, so offsets are relative to
+    # the end of the header
+    encoded = json.dumps(header).encode()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for data in chunks:
+            f.write(data)
+    os.replace(temporary, path)
+
+
+def read_vocabulary(path):
+    """
+    Read a cache file written by write_vocabulary. The words are decoded
+    now; the index bitsets are read from the mapped file when first used.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError(f"not a vocabulary cache: {path}")
+    start = len(CACHE_MAGIC) + 8
+    size = int.from_bytes(data[len(CACHE_MAGIC):start], "little")
+    header = json.loads(data[start:start + size])
+    base = start + size
+
+    vocabulary = dict()
+    for length, offset, count in header["words"]:
+        words = data[base + offset:base + offset + count].decode()
+        vocabulary[length] = words.split("\n")
+    offsets = {
+        (length, k, letter): (base + offset, count)
+        for length, k, letter, offset, count in header["index"]
+    }
+    index = BitsetIndex(path, offsets)
+    index.data = data
+    return vocabulary, index
+
+
+def load_vocabulary(words_file, cache=None):
+    """
+    Return the vocabulary of words_file (one word per line, uppercased)
+    grouped by length, and its BitsetIndex.
+
+    If cache is a directory, the result is stored there in a file named
+    after the SHA-256 of words_file, and later loads of the same contents
+    read it instead of rebuilding the index. If the cache cannot be
+    written, the vocabulary is returned without it.
+    """
+    if cache is None:
+        with open(words_file) as f:
+            return build_vocabulary(f.read().upper().splitlines())
+
+    with open(words_file, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    path = os.path.join(cache, f"{digest}.vocabulary")
+    try:
+        return read_vocabulary(path)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with open(words_file) as f:
+        vocabulary, index = build_vocabulary(f.read().upper().splitlines())
+    try:
+        os.makedirs(cache, exist_ok=True)
+        write_vocabulary(path, vocabulary, index)
+    except OSError:
+        pass
+    return vocabulary, index
@@ -1,20 +1,160 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import random
 import sys
-from collections import deque
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager, nullcontext
 from crossword import *
 
+# Máximo de nogoods guardados durante uma busca com backjumping
+NOGOOD_LIMIT = 10000
+
+# Estratégias do portfólio, usadas em rodízio pelos processos
+STRATEGIES = [
+    {"inference": "mac", "backjumping": False, "ordering": "mrv", "values": "lcv"},
+    {"inference": "mac", "backjumping": True, "ordering": "wdeg", "values": "lcv"},
+    {"inference": "forward", "backjumping": True, "ordering": "wdeg", "values": "random"},
+    {"inference": "mac", "backjumping": True, "ordering": "mrv", "values": "random"},
+]
+
+
+class Restart(Exception):
+    """A busca passou do limite de falhas e deve recomeçar."""
+
+
+class SearchStats():
+
+    def __init__(self, report="summary", trace=None, file=None):
+        """
+        Contadores e tempos por fase de uma execução de `solve`.
+
+        `report` é o formato do relatório impresso em `file` (stderr por
+        padrão) ao fim de `solve`: "summary", "json" ou None. `trace`, se
+        dado, é chamado com cada evento da busca, como um dicionário.
+        """
+        self.counts = Counter()
+        self.times = Counter()
+        self.format = report
+        self.trace = trace
+        self.file = file
+
+    @contextmanager
+    def phase(self, name):
+        """Soma ao tempo da fase `name` a duração do bloco `with`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def event(self, kind, **data):
+        """Repassa um evento da busca para `trace`, se houver."""
+        if self.trace is not None:
+            self.trace({"event": kind, **data})
+
+    def as_dict(self):
+        """Retorna os contadores e os tempos (em segundos) por fase."""
+        return {"counts": dict(self.counts), "seconds": dict(self.times)}
+
+    def report(self):
+        """Imprime o relatório no formato escolhido."""
+        file = self.file or sys.stderr
+        if self.format == "json":
+            print(json.dumps(self.as_dict()), file=file)
+        elif self.format == "summary":
+            for name, count in sorted(self.counts.items()):
+                print(f"{name}: {count}", file=file)
+            for name, seconds in self.times.items():
+                print(f"{name}: {seconds:.3f}s", file=file)
+
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, inference="mac", backjumping=False,
+                 ordering="mrv", nogood_limit=NOGOOD_LIMIT, values="lcv",
+                 seed=None, stats=None, lcv_limit=None):
         """
         Create new CSP crossword generate.
+
+        Cada domínio é um bitset (int) de IDs de palavras do comprimento da
+        variável: o bit k está ligado se a palavra k de
+        `crossword.vocabulary[var.length]` ainda é possível.
+
+        `inference` escolhe o que o backtracking faz depois de cada atribuição:
+        None (nada), "forward" (forward checking nos vizinhos) ou "mac"
+        (mantém a consistência de arco com o AC-3).
+
+        Com `backjumping`, a busca guarda quais atribuições causaram cada
+        falha, volta direto para a mais recente delas e aprende nogoods
+        (até `nogood_limit`). `ordering` escolhe a próxima variável: "mrv"
+        (menor domínio, depois maior grau) ou "wdeg" (menor domínio dividido
+        pelo peso das restrições que já causaram falhas).
+
+        `values` ordena os valores por "lcv" (menos restritivo primeiro) ou
+        "random". Com `seed`, os empates nas duas ordens são sorteados.
+        Com `lcv_limit`, domínios maiores que isso só têm `lcv_limit`
+        valores (sorteados, se houver semente) ordenados pelo LCV; os
+        demais vêm depois, sem ordem.
+
+        `stats` é um `SearchStats` que conta o trabalho da busca; sem ele,
+        nada é medido.
         """
+        if inference not in (None, "forward", "mac"):
+            raise ValueError(f"unknown inference: {inference}")
+        if ordering not in ("mrv", "wdeg"):
+            raise ValueError(f"unknown ordering: {ordering}")
+        if values not in ("lcv", "random"):
+            raise ValueError(f"unknown value ordering: {values}")
         self.crossword = crossword
+        self.inference = inference
+        self.backjumping = backjumping
+        self.ordering = ordering
+        self.nogood_limit = nogood_limit
+        self.values = values
+        self.lcv_limit = lcv_limit
+        self.stats = stats
+        self.random = random.Random(seed) if seed is not None else None
+        if values == "random" and self.random is None:
+            self.random = random.Random()
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.crossword.all_words(var.length)
             for var in self.crossword.variables
         }
 
+        # Trilha de (variável, domínio anterior, conflitos anteriores) das
+        # podas feitas durante a busca, para desfazê-las no backtracking sem
+        # copiar os domínios
+        self.trail = []
+
+        # Palavras já usadas na atribuição em andamento, e por qual variável
+        self.used = dict()
+
+        # Backjumping: variáveis atribuídas que explicam as podas de cada
+        # domínio, a variável que ficou sem valores na última falha e o
+        # conjunto de conflito devolvido pela última busca que falhou
+        self.conflicts = {var: frozenset() for var in self.crossword.variables}
+        self.wipeout = None
+        self.failure = set()
+
+        # Nogoods aprendidos, em ordem de chegada, e indexados por cada
+        # par (variável, palavra) que contêm
+        self.nogoods = OrderedDict()
+        self.watches = dict()
+
+        # Pesos das restrições (pares de vizinhos) que causaram falhas
+        self.weights = Counter()
+
+        # Recomeços: falhas desde o último recomeço e o limite atual
+        self.failures = 0
+        self.cutoff = None
+
+    def words(self, var):
+        """Retorna a lista de palavras do domínio de `var`."""
+        return self.crossword.decode(var.length, self.domains[var])
+
     def letter_grid(self, assignment):
 
         letters = [
@@ -77,30 +217,92 @@ class CrosswordCreator():
 
         img.save(filename)
 
-    def solve(self):
+    def solve(self, cutoff=None, growth=2):
         """
         Enforce node and arc consistency, and then solve the CSP.
+
+        Com `cutoff`, a busca recomeça do zero depois de `cutoff` falhas, e o
+        limite é multiplicado por `growth` a cada recomeço. Pesos e nogoods
+        aprendidos continuam valendo entre recomeços.
+        """
+        stats = self.stats
+        with stats.phase("node consistency") if stats else nullcontext():
+            self.enforce_node_consistency() #remove as palavras do dominio que nao tem comprimento correto
+        with stats.phase("ac3") if stats else nullcontext():
+            self.ac3() #usa ac3 para garantir que as palavras que se cruzam tenham pelo menos um valor consistente
+        self.trail.clear() #as podas feitas antes da busca nunca sao desfeitas
+        self.cutoff = cutoff
+        with stats.phase("search") if stats else nullcontext():
+            while True:
+                self.failures = 0
+                try:
+                    assignment = self.backtrack(dict()) #usa o backtrack para atribuir palavras a cada variavel ate a solucao
+                    break
+                except Restart:
+                    self.undo(0) #volta aos dominios logo depois do ac3
+                    self.cutoff = int(self.cutoff * growth) + 1
+                    if stats is not None:
+                        stats.counts["restarts"] += 1
+                        stats.event("restart", cutoff=self.cutoff)
+        if stats is not None:
+            stats.counts["solved"] = int(assignment is not None)
+            stats.report()
+        return assignment
+
+    def prune(self, var, domain, cause=None):
+        """
+        Troca o domínio de `var` por `domain`, guardando o anterior na
+        trilha para que `undo` possa restaurá-lo. `cause` é a variável cujo
+        domínio justificou a poda, para o backjumping.
+        """
+        self.trail.append((var, self.domains[var], self.conflicts[var]))
+        self.domains[var] = domain
+        if self.backjumping and cause is not None:
+            self.conflicts[var] = self.conflicts[var] | self.conflicts[cause]
+
+    def undo(self, mark):
+        """Desfaz as podas da trilha até que ela volte ao tamanho `mark`."""
+        while len(self.trail) > mark:
+            var, domain, conflicts = self.trail.pop()
+            self.domains[var] = domain
+            self.conflicts[var] = conflicts
+
+    def infer(self, var, value, assignment):
+        """
+        Depois de atribuir `value` a `var`, poda os domínios conforme
+        `self.inference`. Retorna False se algum domínio ficar vazio.
         """
-        self.enforce_node_consistency() #remove as palavras do dominio que nao tem comprimento correto
-        self.ac3() #usa ac3 para garantir que as palavras que se cruzam tenham pelo menos um valor consistente
-        return self.backtrack(dict()) #usa o backtrack para atribuir palavras a cada variavel ate a solucao
+        if self.inference is None:
+            return True
+
+        # O domínio de uma variável atribuída passa a ter só o seu valor,
+        # explicado pela própria atribuição
+        self.prune(var, 1 << self.crossword.ids[value])
+        if self.backjumping:
+            self.conflicts[var] = frozenset([var])
+        arcs = [
+            (neighbor, var) for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+        if self.inference == "forward":
+            for x, y in arcs:
+                self.revise(x, y)
+                if not self.domains[x]:
+                    return False
+            return True
+        return self.ac3(arcs)
 
     def enforce_node_consistency(self):
-        #percorre todas as variaveis do CSP, verifica se alguma palavra do dominio nao tem o tamanho correto
-        #remove as invalidas
-        print("enforce node conssitency")
+        #percorre todas as variaveis do CSP e deixa no dominio so as palavras com o tamanho correto
+        #como os IDs sao por comprimento, basta um AND com o bitset de todas as palavras do tamanho
         for variable in self.domains:
-            lenght = variable.length
-            invalid_words = {word for word in self.domains[variable] if len(word) != lenght}
-            for word in invalid_words:
-                self.domains[variable].remove(word)
+            self.domains[variable] &= self.crossword.all_words(variable.length)
 
-   
-            
     def revise(self, x, y):
         #verifica se x e y tem sobreposicao, se tiverem, verifica se ha palavras em x que nunca 
         #podem ser compativeis com y e as remove do dominio de x
-        print("revise")
+        if self.stats is not None:
+            self.stats.counts["revisions"] += 1
         if (x,y) not in self.crossword.overlaps:
             return False
         
@@ -110,23 +312,30 @@ class CrosswordCreator():
         
         i,j = overlap
         revise = False
-        remove = set()
 
-        for wx in self.domains[x]:
-            match = False
-            for wy in self.domains[y]:
-                if i < len(wx) and j < len(wy) and wx[i] == wy[j]:
-                    match = True
-                    break
-            if not match:
-                remove.add(wx)
-
-        if remove:
-            print("removeu")
-            self.domains[x] -= remove
+        #em vez de comparar cada par de palavras, agrupa as palavras de x pela letra na posicao i
+        #uma letra so tem suporte se alguma palavra de y tem a mesma letra na posicao j (indice)
+        #com bitsets cada grupo e cada teste sao um AND
+        keep = 0
+        for letter in self.crossword.letters:
+            group = self.domains[x] & self.crossword.matching(x.length, i, letter)
+            if group and self.domains[y] & self.crossword.matching(y.length, j, letter):
+                keep |= group
+
+        if keep != self.domains[x]:
+            if self.stats is not None:
+                self.stats.counts["pruned values"] += (
+                    self.domains[x].bit_count() - keep.bit_count()
+                )
+            self.prune(x, keep, y)
             revise = True
             if not self.domains[x]:
-                print(f"Domínio de {x} ficou vazio! Impossível resolver.")
+                if self.stats is not None:
+                    self.stats.counts["wipeouts"] += 1
+                    self.stats.event("wipeout", variable=str(x), cause=str(y))
+                self.wipeout = x
+                self.weights[x, y] += 1
+                self.weights[y, x] += 1
         
         return revise
 
@@ -134,16 +343,14 @@ class CrosswordCreator():
 
     def ac3(self, arcs=None):
         #se arcs nao for passado, cria uma fila de pares (x,y), com sobreposicao
-        print("ac3")
         if arcs is not None:
             queue = deque(arcs)
         else:
             
             queue = deque()
             for x in self.domains:
-                for y in self.domains:
-                    if x != y and self.crossword.overlaps.get((x, y)) is not None:
-                        queue.append((x, y))
+                for y in self.crossword.neighbors(x):
+                    queue.append((x, y))
         #para cada par(x,y) chama revise(x,y), que pode reduzir o dominio de x
         while queue:
             x, y = queue.popleft()
@@ -160,7 +367,6 @@ class CrosswordCreator():
 
     def assignment_complete(self, assignment):
         #retorna true se todas as variaveis tem uma palavra atribuida
-        print("assignment compleete")
         for var in self.crossword.variables:
             if var not in assignment:
                 return False
@@ -171,7 +377,6 @@ class CrosswordCreator():
     def consistent(self, assignment):
         #verifica se a atribuicao esta correta
         used_words = set()
-        print("consistetn")
         for var, word in assignment.items():
             #if the word repeat
             if word in used_words:
@@ -201,16 +406,47 @@ class CrosswordCreator():
 
         elim_count = {}  # Dicionário para armazenar a contagem de eliminações para cada valor no domínio de `var`
 
-        for value in self.domains[var]:  # Para cada palavra possível no domínio da variável `var`
+        neighbors = [  # Apenas considera vizinhos ainda não atribuídos
+            (neighbor, self.crossword.overlaps[var, neighbor])
+            for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+        values = self.words(var)
+        if self.random is not None:
+            self.random.shuffle(values)  # Empates ficam em ordem aleatória
+        if self.values == "random":
+            return values
+
+        # Domínios enormes: só os primeiros `lcv_limit` valores (já
+        # embaralhados, se houver semente) são ordenados; o resto vem depois
+        rest = []
+        if self.lcv_limit is not None and len(values) > self.lcv_limit:
+            values, rest = values[:self.lcv_limit], values[self.lcv_limit:]
+
+        # Suporte de cada letra no cruzamento: quantas palavras do domínio do
+        # vizinho têm essa letra na posição j. Calculado uma vez por vizinho,
+        # transforma a contagem de cada valor em uma soma de consultas
+        supports = []
+        for neighbor, (i, j) in neighbors:
+            domain = self.domains[neighbor]
+            support = {
+                letter: (domain & self.crossword.matching(neighbor.length, j, letter)).bit_count()
+                for letter in self.crossword.letters
+            }
+            supports.append((neighbor, i, j, domain, domain.bit_count(), support))
+
+        for value in values:  # Para cada palavra possível no domínio da variável `var`
             count = 0  # Conta quantas palavras serão eliminadas dos domínios dos vizinhos
-            for neighbor in self.crossword.neighbors(var):  # Percorre os vizinhos da variável
-                if neighbor not in assignment:  # Apenas considera vizinhos ainda não atribuídos
-                    count += sum(1 for n_value in self.domains[neighbor] 
-                                if not self.consistent({var: value, neighbor: n_value}))
+            for neighbor, i, j, domain, size, support in supports:
+                # Continuam válidas as palavras do vizinho com a mesma letra no cruzamento
+                count += size - support[value[i]]
+                if (neighbor.length == var.length and value[j] == value[i]
+                        and domain >> self.crossword.ids[value] & 1):
+                    count += 1  # A mesma palavra não pode se repetir
 
             elim_count[value] = count  # Associa a palavra ao número de valores eliminados nos vizinhos
 
-        return sorted(self.domains[var], key=lambda v: elim_count[v])  
+        return sorted(values, key=lambda v: elim_count[v]) + rest
         # Ordena os valores com base no número de eliminações (menor primeiro)
 
         
@@ -222,69 +458,318 @@ class CrosswordCreator():
         2. Em caso de empate, a variável com o maior número de vizinhos.
         3. Se ainda houver empate, qualquer uma das empatadas pode ser escolhida.
         """
-        print("select unasigned variables")
         unassigned = [v for v in self.crossword.variables if v not in assignment]  # Lista de variáveis não atribuídas
         if not unassigned:
             return None  # Se não houver mais variáveis, retorna None (todos já foram atribuídos)
+
+        if self.ordering == "wdeg":
+            # dom/wdeg: tamanho do domínio dividido pela soma dos pesos das
+            # restrições com vizinhos não atribuídos (cada uma começa em 1)
+            def score(v):
+                weight = sum(
+                    1 + self.weights[v, n] for n in self.crossword.neighbors(v)
+                    if n not in assignment
+                )
+                return (self.domains[v].bit_count() / max(weight, 1),
+                        -len(self.crossword.neighbors(v)),
+                        self.random.random() if self.random else 0)
+            return min(unassigned, key=score)
         
         sorted_variables = []
         for v in unassigned:
-            num_values = len(self.domains[v])  # Quantidade de valores no domínio da variável
+            num_values = self.domains[v].bit_count()  # Quantidade de valores no domínio da variável
             num_neighbors = len(self.crossword.neighbors(v))  # Quantidade de vizinhos no grafo do problema
             
-            sorted_variables.append((v, num_values, num_neighbors))  # Armazena a variável com suas métricas
+            tie = self.random.random() if self.random else 0  # Desempate aleatório, se houver semente
+            sorted_variables.append((v, num_values, num_neighbors, tie))  # Armazena a variável com suas métricas
         
-        sorted_variables.sort(key=lambda x: (x[1], -x[2]))  # Ordena por: menos valores no domínio e mais vizinhos
+        sorted_variables.sort(key=lambda x: (x[1], -x[2], x[3]))  # Ordena por: menos valores no domínio e mais vizinhos
         
         return sorted_variables[0][0]  # Retorna a variável com menor domínio e mais vizinhos (se houver empate)
 
 
+    def consistent_value(self, var, value, assignment):
+        """
+        Verifica só a nova atribuição `var` = `value` (com `var` ainda fora de
+        `assignment`): a palavra não pode estar em uso, deve ter o tamanho
+        certo e deve concordar com os vizinhos já atribuídos. Equivale a
+        `consistent` na atribuição estendida, se `assignment` já era
+        consistente e `self.used` tem as suas palavras.
+        """
+        return self.clash(var, value, assignment) is None
+
+    def clash(self, var, value, assignment):
+        """
+        Retorna a variável atribuída que impede `var` = `value` (a própria
+        `var` se a palavra tiver o tamanho errado), ou None se não houver.
+        """
+        if len(value) != var.length:
+            return var
+        if value in self.used:
+            return self.used[value]
+        for neighbor in self.crossword.neighbors(var):
+            if neighbor in assignment:
+                i, j = self.crossword.overlaps[var, neighbor]
+                if value[i] != assignment[neighbor][j]:
+                    return neighbor
+        return None
+
+    def learn(self, conflict, assignment):
+        """
+        Guarda o nogood formado pelas atribuições das variáveis em
+        `conflict`, descartando o mais antigo se já houver `nogood_limit`.
+        Retorna se um novo nogood foi guardado.
+        """
+        if not conflict:
+            return False
+        nogood = frozenset((v, assignment[v]) for v in conflict)
+        if nogood in self.nogoods:
+            return False
+        if len(self.nogoods) >= self.nogood_limit:
+            old, _ = self.nogoods.popitem(last=False)
+            for literal in old:
+                self.watches[literal].discard(old)
+                if not self.watches[literal]:
+                    del self.watches[literal]
+        self.nogoods[nogood] = None
+        for literal in nogood:
+            self.watches.setdefault(literal, set()).add(nogood)
+        return True
+
+    def violated(self, var, value, assignment):
+        """
+        Se `var` = `value` completa um nogood com `assignment`, retorna as
+        outras variáveis do nogood; senão, None.
+        """
+        for nogood in self.watches.get((var, value), ()):
+            if all(v == var or assignment.get(v) == w for v, w in nogood):
+                return {v for v, _ in nogood if v != var}
+        return None
+
     def backtrack(self, assignment):
     # Se a atribuição está completa, retorna a solução.
     # Escolhe uma variável e tenta atribuir um valor.
-    # Se a atribuição é consistente, chama backtrack() recursivamente.
+    # Se a atribuição é consistente, chama search() recursivamente.
     # Se não encontrar solução, desfaz a escolha (backtracking).
-        print("backtrack")
+        self.used = {word: var for var, word in assignment.items()}
+        return self.search(assignment)
+
+    def search(self, assignment):
+        """
+        Passo recursivo de `backtrack`, que mantém `self.used` em dia.
+
+        Com backjumping, uma busca que falha deixa em `self.failure` o seu
+        conjunto de conflito: as variáveis atribuídas que explicam a falha.
+        Quem não estiver nele desfaz a sua escolha e repassa a falha adiante,
+        sem tentar outros valores.
+        """
+        if self.stats is not None:
+            self.stats.counts["nodes"] += 1
         if len(assignment) == len(self.crossword.variables):
             return assignment
         var = self.select_unassigned_variable(assignment)
+
+        # Os valores já podados do domínio de `var` contam para o conflito
+        conflict = set(self.conflicts[var])
         for value in self.order_domain_values(var,assignment):
+            culprit = self.clash(var, value, assignment)
+            if culprit is not None:
+                conflict.add(culprit)
+                if culprit != var:
+                    self.weights[var, culprit] += 1
+                    self.weights[culprit, var] += 1
+                continue
+            if self.backjumping:
+                nogood = self.violated(var, value, assignment)
+                if nogood is not None:
+                    if self.stats is not None:
+                        self.stats.counts["nogood hits"] += 1
+                    conflict |= nogood
+                    continue
             assignment[var] = value
-
-            if self.consistent(assignment):
-                result = self.backtrack(assignment)
+            self.used[value] = var
+            if self.stats is not None:
+                self.stats.event("assign", variable=str(var), value=value,
+                                 depth=len(assignment))
+
+            mark = len(self.trail)
+            if self.infer(var, value, assignment):
+                result = self.search(assignment)
                 if result is not None:
                     return result
+                failure = self.failure
+            else:
+                failure = set(self.conflicts[self.wipeout])
+            self.undo(mark)  # Restaura os domínios podados por esta escolha
+            del self.used[value]
             del assignment[var]
-        
+            if self.stats is not None:
+                self.stats.counts["backtracks"] += 1
+                self.stats.event("unassign", variable=str(var), value=value)
+
+            self.failures += 1
+            if self.cutoff is not None and self.failures >= self.cutoff:
+                raise Restart()
+
+            # A falha não depende de `var`: volta direto para a sua causa
+            if self.backjumping and var not in failure:
+                if self.stats is not None:
+                    self.stats.counts["backjumps"] += 1
+                self.failure = failure
+                return None
+            conflict |= failure
+
+        conflict.discard(var)
+        if self.backjumping and self.learn(conflict, assignment):
+            if self.stats is not None:
+                self.stats.counts["nogoods learned"] += 1
+        self.failure = conflict
         return None
 
 
+def run_strategy(crossword, job):
+    """
+    Resolve com a estratégia e a semente do `job` (k, semente, limite,
+    formato do relatório de estatísticas ou None, `lcv_limit`).
+    """
+    k, seed, cutoff, report, lcv_limit = job
+    creator = CrosswordCreator(
+        crossword, seed=seed,
+        stats=SearchStats(report) if report else None,
+        lcv_limit=lcv_limit,
+        **STRATEGIES[k % len(STRATEGIES)]
+    )
+    return k, creator.solve(cutoff)
+
+
+def portfolio_worker(crossword, job, connection):
+    """Roda uma busca do portfólio e envia o resultado por `connection`."""
+    connection.send(run_strategy(crossword, job))
+    connection.close()
+
+
+def portfolio(crossword, processes, seed=0, cutoff=100, report=None,
+              lcv_limit=None):
+    """
+    Resolve com `processes` buscas em paralelo, cada uma com uma estratégia
+    de `STRATEGIES` (em rodízio), sua própria semente e recomeços a partir
+    de `cutoff` falhas. Toda busca é completa, então a primeira a terminar
+    dá a resposta (uma solução ou None) e as demais são canceladas.
+
+    Com `report`, cada busca que termina imprime as suas estatísticas.
+    `lcv_limit` vale para todas as buscas (veja CrosswordCreator).
+
+    Retorna o índice da busca vencedora e a sua atribuição.
+    """
+    jobs = [(k, seed + k, cutoff, report, lcv_limit) for k in range(processes)]
+    if processes == 1:
+        return run_strategy(crossword, jobs[0])
+
+    # Um processo e um pipe por busca: matar uma busca no meio do envio só
+    # afeta o seu próprio pipe, que ninguém mais lê
+    workers = []
+    receivers = []
+    try:
+        for job in jobs:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            worker = multiprocessing.Process(
+                target=portfolio_worker, args=(crossword, job, sender),
+                daemon=True
+            )
+            worker.start()
+            sender.close()
+            workers.append(worker)
+            receivers.append(receiver)
+
+        while receivers:
+            for receiver in multiprocessing.connection.wait(receivers):
+                try:
+                    return receiver.recv()
+                except EOFError:  # A busca morreu sem resultado
+                    receivers.remove(receiver)
+        raise RuntimeError("todas as buscas do portfólio falharam")
+    finally:
+        for worker in workers:
+            worker.kill()
+        for worker in workers:
+            worker.join()
+        for receiver in receivers:
+            receiver.close()
 
-def main():
 
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+def main():
 
-    # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(description="Gera palavras cruzadas.")
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--inference", choices=["none", "forward", "mac"])
+    parser.add_argument("--backjumping", action="store_true")
+    parser.add_argument("--ordering", choices=["mrv", "wdeg"])
+    parser.add_argument("--values", choices=["lcv", "random"])
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--lcv-limit", type=int, metavar="N",
+                        help="ordena pelo LCV só N valores de cada domínio")
+    parser.add_argument("--restarts", type=int, metavar="CUTOFF",
+                        help="recomeça depois de CUTOFF falhas (limite crescente)")
+    parser.add_argument("--portfolio", type=int, metavar="N",
+                        help="roda N buscas em paralelo; a primeira a terminar vence")
+    parser.add_argument("--stats", choices=["summary", "json"],
+                        help="imprime estatísticas da busca em stderr")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="grava os eventos da busca em FILE (JSON Lines)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="guarda e reaproveita o vocabulário pré-processado em DIR")
+    args = parser.parse_args()
+    if args.portfolio and args.trace:
+        parser.error("--trace não pode ser usado com --portfolio")
+    if args.portfolio:
+        # No portfólio, a estratégia de cada busca vem de STRATEGIES
+        for flag, value in [("--inference", args.inference),
+                            ("--backjumping", args.backjumping),
+                            ("--ordering", args.ordering),
+                            ("--values", args.values)]:
+            if value:
+                parser.error(f"{flag} não pode ser usado com --portfolio")
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(args.structure, args.words, args.cache)
+    if args.portfolio:
+        creator = CrosswordCreator(crossword)
+        _, assignment = portfolio(crossword, args.portfolio,
+                                  args.seed or 0, args.restarts or 100,
+                                  args.stats, args.lcv_limit)
+    else:
+        trace = open(args.trace, "w") if args.trace else None
+        stats = None
+        if args.stats or trace:
+            stats = SearchStats(
+                args.stats,
+                (lambda event: print(json.dumps(event), file=trace))
+                if trace else None
+            )
+        creator = CrosswordCreator(
+            crossword,
+            inference={"none": None, None: "mac"}.get(args.inference, args.inference),
+            backjumping=args.backjumping,
+            ordering=args.ordering or "mrv",
+            values=args.values or "lcv",
+            seed=args.seed,
+            stats=stats,
+            lcv_limit=args.lcv_limit,
+        )
+        assignment = creator.solve(args.restarts)
+        if trace:
+            trace.close()
 
     # Print result
     if assignment is None:
         print("No solution.")
     else:
         creator.print(assignment)
-        if output:
-            creator.save(assignment, output)
+        if args.output:
+            creator.save(assignment, args.output)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
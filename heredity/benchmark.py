@@ -0,0 +1,249 @@
+import argparse
+import csv
+import itertools
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from heredity import (PROBS, empty_probabilities, inherit_prob,
+                      joint_probability, normalize, parallel_probabilities,
+                      powerset, shard_probabilities, update)
+from pedigree import Pedigree
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Gera famílias sintéticas e mede os motores de inferência."
+    )
+    parser.add_argument("--depth", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--branching", type=int, nargs="+", default=[2])
+    parser.add_argument("--founders", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--evidence", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--loops", type=int, nargs="+", default=[0, 1])
+    parser.add_argument("--seeds", type=int, default=1,
+                        help="famílias geradas por configuração")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES),
+                        choices=list(ENGINES))
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--max-enumeration", type=int, default=7,
+                        help="maior família para a enumeração original")
+    parser.add_argument("--max-gray", type=int, default=8,
+                        help="maior família para a enumeração em código de Gray")
+    parser.add_argument("--output", help="arquivo JSON Lines (padrão: stdout)")
+    parser.add_argument("--save-csv", metavar="PREFIX",
+                        help="salva cada família gerada como PREFIX<n>.csv")
+    args = parser.parse_args()
+
+    limits = {
+        "enumeration": args.max_enumeration,
+        "gray": args.max_gray,
+        "parallel": args.max_gray,
+    }
+    out = open(args.output, "w") if args.output else sys.stdout
+    configs = itertools.product(args.depth, args.branching, args.founders,
+                                args.evidence, args.loops, range(args.seeds))
+    for n, (depth, branching, founders, evidence, loops, seed) in enumerate(configs):
+        people = generate_pedigree(depth, branching, founders, evidence,
+                                   loops, seed)
+        if args.save_csv:
+            write_csv(people, f"{args.save_csv}{n}.csv")
+        pedigree = {
+            "depth": depth, "branching": branching, "founders": founders,
+            "evidence": evidence, "loops": loops, "seed": seed,
+            "people": len(people),
+            "unknown_traits": sum(
+                1 for person in people if people[person]["trait"] is None
+            ),
+        }
+        for record in run_engines(people, args.engines, limits, args.processes):
+            print(json.dumps({"pedigree": pedigree, **record}), file=out)
+            out.flush()
+    if args.output:
+        out.close()
+
+
+def generate_pedigree(depth, branching, founders, evidence, loops, seed=0):
+    """
+    Gere uma família sintética no formato de `load_data`.
+
+    * `founders` pessoas sem pais formam os casais da geração 0;
+    * cada casal tem `branching` filhos, por `depth` gerações;
+    * quem não casa com um parente casa com um novo fundador (agregado);
+    * até `loops` casamentos por geração são entre parentes (primos quando
+      possível), criando ciclos de consanguinidade;
+    * genes e características são sorteados com `PROBS`, e cada
+      característica é observada com probabilidade `evidence`.
+    """
+    rng = random.Random(seed)
+    people = {}
+    genes = {}
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        if mother is None:
+            weights = [PROBS["gene"][g] for g in (0, 1, 2)]
+            genes[name] = rng.choices((0, 1, 2), weights)[0]
+        else:
+            genes[name] = sum(
+                rng.random() < inherit_prob(genes[parent])
+                for parent in (mother, father)
+            )
+        has_trait = rng.random() < PROBS["trait"][genes[name]][True]
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": has_trait if rng.random() < evidence else None
+        }
+        return name
+
+    def grandparents(person):
+        parents = {people[person]["mother"], people[person]["father"]} - {None}
+        return {
+            people[parent][field]
+            for parent in parents for field in ("mother", "father")
+        } - {None}
+
+    generation = [add() for _ in range(max(founders, 2))]
+    couples = [tuple(generation[i:i + 2]) for i in range(0, len(generation) - 1, 2)]
+    for level in range(depth):
+        children = []
+        for mother, father in couples:
+            children.extend(add(mother, father) for _ in range(branching))
+        if level == depth - 1:
+            break
+
+        # Casamentos entre parentes (não irmãos), até `loops` por geração
+        rng.shuffle(children)
+        single = list(children)
+        couples = []
+        for _ in range(loops):
+            pairs = [
+                (a, b) for a, b in itertools.combinations(single, 2)
+                if people[a]["mother"] != people[b]["mother"]
+            ]
+            cousins = [(a, b) for a, b in pairs if grandparents(a) & grandparents(b)]
+            if not (cousins or pairs):
+                break
+            a, b = rng.choice(cousins or pairs)
+            single.remove(a)
+            single.remove(b)
+            couples.append((a, b))
+
+        # Os demais casam com agregados
+        couples.extend((person, add()) for person in single)
+    return people
+
+
+def write_csv(people, filename):
+    """Salve a família no formato CSV lido por `load_data`."""
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = person["trait"]
+            writer.writerow([
+                person["name"], person["mother"] or "", person["father"] or "",
+                "" if trait is None else int(trait)
+            ])
+
+
+def enumeration(people, processes):
+    """A enumeração original: `powerset`, `joint_probability` e `update`."""
+    probabilities = empty_probabilities(people)
+    names = set(people)
+    for have_trait in powerset(names):
+        fails_evidence = any(
+            (people[person]["trait"] is not None and
+             people[person]["trait"] != (person in have_trait))
+            for person in names
+        )
+        if fails_evidence:
+            continue
+        for one_gene in powerset(names):
+            for two_genes in powerset(names - one_gene):
+                p = joint_probability(people, one_gene, two_genes, have_trait)
+                update(probabilities, one_gene, two_genes, have_trait, p)
+    normalize(probabilities)
+    return probabilities
+
+
+def gray(people, processes):
+    """Enumeração com fatores memorizados em ordem de código de Gray."""
+    probabilities = shard_probabilities(people, ())
+    normalize(probabilities)
+    return probabilities
+
+
+def parallel(people, processes):
+    """Enumeração em shards, com `processes` processos."""
+    probabilities = parallel_probabilities(people, processes)
+    normalize(probabilities)
+    return probabilities
+
+
+def junction_tree(people, processes):
+    """Compilação em árvore de junção (`pedigree.py`) e uma consulta."""
+    return Pedigree(people).query()
+
+
+ENGINES = {
+    "enumeration": enumeration,
+    "gray": gray,
+    "parallel": parallel,
+    "pedigree": junction_tree,
+}
+
+
+def max_deviation(probabilities, reference):
+    """Maior diferença absoluta entre duas tabelas normalizadas."""
+    return max(
+        abs(probabilities[person][field][value] - reference[person][field][value])
+        for person in reference
+        for field in reference[person]
+        for value in reference[person][field]
+    )
+
+
+def run_engines(people, engines, limits, processes):
+    """
+    Rode cada motor e gere um registro por motor com tempo de parede, pico de
+    memória (alocações Python do processo principal, medidas com tracemalloc
+    numa segunda execução) e desvio máximo em relação à resposta exata,
+    quando algum motor de enumeração exata coube nos limites.
+    """
+    results = {}
+    records = []
+    for name in engines:
+        if len(people) > limits.get(name, float("inf")):
+            records.append({"engine": name, "skipped": True})
+            continue
+        engine = ENGINES[name]
+
+        start = time.perf_counter()
+        results[name] = engine(people, processes)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        engine(people, processes)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        records.append({"engine": name, "skipped": False,
+                        "seconds": seconds, "peak_bytes": peak})
+
+    reference = results.get("enumeration") or results.get("gray")
+    for record in records:
+        if not record["skipped"]:
+            record["max_deviation"] = (
+                max_deviation(results[record["engine"]], reference)
+                if reference is not None else None
+            )
+    return records
+
+
+if __name__ == "__main__":
+    main()
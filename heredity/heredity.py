@@ -1,5 +1,7 @@
 import csv
+import functools
 import itertools
+import multiprocessing
 import sys
 
 PROBS = {
@@ -46,51 +48,28 @@ PROBS = {
 
 def main():
 
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python heredity.py data.csv [processes]")
     people = load_data(sys.argv[1])
+    processes = int(sys.argv[2]) if len(sys.argv) == 3 else 1
 
     # Acompanhe as probabilidades genéticas e características de cada pessoa
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
-
-    # Passe por todos os grupos de pessoas que possam ter a característica
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Verifique se o conjunto atual de pessoas viola informações conhecidas
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Faça um loop sobre todos os grupos de pessoas que possam ter o gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Atualizar probabilidades com nova probabilidade conjunta
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    if processes > 1:
+        probabilities = parallel_probabilities(people, processes)
+    else:
+        probabilities = shard_probabilities(people, ())
 
     # Certifique-se de que as probabilidades somam 1
     normalize(probabilities)
 
     # Print results
+    print_probabilities(people, probabilities)
+
+
+def print_probabilities(people, probabilities):
+    """
+    Imprima as distribuições de gene e característica de cada pessoa.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -127,22 +106,238 @@ def powerset(s):
     Retorne uma lista de todos os subconjuntos possíveis do conjunto s.
     gera combinações das pessoas que possuem a caracteristica com as que possuem um ou dois genes
     """
+    return list(iter_powerset(s))
+
+
+def iter_powerset(s):
+    """
+    Igual a `powerset`, mas gera os subconjuntos sob demanda,
+    sem materializar a lista inteira na memória.
+    """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
-
-def parents_prob(parent, two_genes, one_gene):
-    if parent in two_genes:
+    for r in range(len(s) + 1):
+        for subset in itertools.combinations(s, r):
+            yield set(subset)
+
+
+def empty_probabilities(people):
+    """
+    Retorne a estrutura de `probabilities` zerada para as pessoas dadas.
+    """
+    return {
+        person: {
+            "gene": {
+                2: 0,
+                1: 0,
+                0: 0
+            },
+            "trait": {
+                True: 0,
+                False: 0
+            }
+        }
+        for person in people
+    }
+
+
+def gray_code(radices):
+    """
+    Gere as mudanças de um código de Gray refletido de base mista
+    (Knuth, TAOCP 7.2.1.1, algoritmo H). A partir de todos os dígitos em 0,
+    cada passo muda um único dígito em ±1; é gerado o par (dígito, novo valor).
+    Todas as bases devem ser pelo menos 2.
+    """
+    n = len(radices)
+    digits = [0] * n
+    direction = [1] * n
+    focus = list(range(n + 1))
+    while True:
+        j = focus[0]
+        focus[0] = 0
+        if j == n:
+            return
+        digits[j] += direction[j]
+        yield j, digits[j]
+        if digits[j] == 0 or digits[j] == radices[j] - 1:
+            direction[j] = -direction[j]
+            focus[j] = focus[j + 1]
+            focus[j + 1] = j + 1
+
+
+class ProductTree():
+
+    def __init__(self, values):
+        """
+        Árvore de segmentos com o produto de `values`. Trocar um valor custa
+        O(log n) multiplicações, sem divisões (fatores zero não são problema).
+        """
+        self.size = 1
+        while self.size < len(values):
+            self.size *= 2
+        self.nodes = [1] * (2 * self.size)
+        self.nodes[self.size:self.size + len(values)] = values
+        for i in reversed(range(1, self.size)):
+            self.nodes[i] = self.nodes[2 * i] * self.nodes[2 * i + 1]
+
+    def set(self, i, value):
+        i += self.size
+        self.nodes[i] = value
+        i //= 2
+        while i:
+            self.nodes[i] = self.nodes[2 * i] * self.nodes[2 * i + 1]
+            i //= 2
+
+    def product(self):
+        return self.nodes[1]
+
+
+def shard_probabilities(people, prefix):
+    """
+    Acumule as probabilidades conjuntas de um fragmento (shard) do espaço de
+    atribuições, em uma cópia local de `probabilities`.
+
+    `prefix` fixa o número de genes das primeiras pessoas (em ordem alfabética);
+    as demais variam livremente. Com `prefix` vazio, o espaço inteiro é percorrido.
+
+    As atribuições são visitadas em ordem de código de Gray: a cada passo só
+    muda o gene ou a característica de uma pessoa, então só os fatores dela
+    (e dos filhos, se mudou o gene) são recalculados, e o produto é atualizado
+    de forma incremental.
+    """
+    names = sorted(people)
+    index = {person: i for i, person in enumerate(names)}
+    genes = dict.fromkeys(names, 0)
+    genes.update(zip(names, prefix))
+    traits = {person: bool(people[person]["trait"]) for person in names}
+
+    children = {person: [] for person in names}
+    for person in names:
+        for parent in {people[person]["mother"], people[person]["father"]}:
+            if parent is not None:
+                children[parent].append(person)
+
+    def factor(person):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None and father is None:
+            return person_factor(genes[person], traits[person], None, None)
+        return person_factor(genes[person], traits[person],
+                             genes.get(mother, 0), genes.get(father, 0))
+
+    # Dígitos do código de Gray: genes das pessoas livres e características
+    # desconhecidas (as conhecidas ficam fixas pela evidência)
+    digits = [("gene", person, 3) for person in names[len(prefix):]]
+    digits += [("trait", person, 2) for person in names
+               if people[person]["trait"] is None]
+
+    tree = ProductTree([factor(person) for person in names])
+
+    # Em vez de somar p em cada pessoa a cada passo, guardamos a soma total
+    # `seen` e, quando o estado de alguém muda, creditamos ao estado antigo a
+    # soma acumulada desde que ele entrou nesse estado
+    probabilities = empty_probabilities(people)
+    seen = tree.product()
+    entered = {(field, person): 0 for field in ("gene", "trait") for person in names}
+
+    for digit, value in gray_code([radix for _, _, radix in digits]):
+        field, person, _ = digits[digit]
+        state = genes[person] if field == "gene" else traits[person]
+        probabilities[person][field][state] += seen - entered[field, person]
+        entered[field, person] = seen
+
+        if field == "gene":
+            genes[person] = value
+            for child in children[person]:
+                tree.set(index[child], factor(child))
+        else:
+            traits[person] = bool(value)
+        tree.set(index[person], factor(person))
+        seen += tree.product()
+
+    for person in names:
+        probabilities[person]["gene"][genes[person]] += seen - entered["gene", person]
+        probabilities[person]["trait"][traits[person]] += seen - entered["trait", person]
+    return probabilities
+
+
+def make_shards(people, processes):
+    """
+    Divida o espaço de atribuições em shards balanceados.
+    Cada shard fixa o número de genes (0, 1 ou 2) das primeiras k pessoas, então
+    todos têm exatamente o mesmo número de atribuições. Usamos cerca de 4 shards
+    por processo para diluir a diferença de velocidade entre os workers.
+    """
+    k = 0
+    while 3 ** k < 4 * processes and k < len(people):
+        k += 1
+    return list(itertools.product((0, 1, 2), repeat=k))
+
+
+def _shard_worker(args):
+    people, prefix = args
+    return shard_probabilities(people, prefix)
+
+
+def merge(probabilities, other):
+    """
+    Some em `probabilities` os valores acumulados em `other`.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                probabilities[person][field][value] += other[person][field][value]
+
+
+def parallel_probabilities(people, processes):
+    """
+    Calcule as probabilidades não normalizadas usando `processes` processos.
+    Cada worker acumula uma cópia local de `probabilities`; as cópias são
+    somadas aqui antes de `normalize`.
+    """
+    probabilities = empty_probabilities(people)
+    shards = [(people, prefix) for prefix in make_shards(people, processes)]
+    with multiprocessing.Pool(processes) as pool:
+        for partial in pool.imap_unordered(_shard_worker, shards):
+            merge(probabilities, partial)
+    return probabilities
+
+def inherit_prob(genes):
+    """
+    Probabilidade de um pai com `genes` cópias passar o gene ao filho.
+    """
+    if genes == 2:
         return 1 - PROBS["mutation"]
-    elif parent in one_gene:
+    elif genes == 1:
         return 0.5
     else:
         return PROBS["mutation"]
 
 
+@functools.lru_cache(maxsize=None)
+def person_factor(num_genes, has_trait, mother_genes, father_genes):
+    """
+    Retorne o fator de uma pessoa na probabilidade conjunta:
+    P(genes | genes dos pais) * P(característica | genes).
+    Depende só do estado local, então é memorizado entre atribuições.
+    Para quem não tem pais no CSV, `mother_genes` e `father_genes` são None.
+    """
+    if mother_genes is None and father_genes is None:
+        gene_prob = PROBS["gene"][num_genes]
+    else:
+        mother_prob = inherit_prob(mother_genes)
+        father_prob = inherit_prob(father_genes)
+
+        if num_genes == 2:
+            gene_prob = mother_prob * father_prob
+        elif num_genes == 1:
+            gene_prob = (mother_prob * (1 - father_prob)) + ((1 - mother_prob) * father_prob)
+        else:
+            gene_prob = (1 - father_prob) * (1 - mother_prob)
+
+    trait_prob = PROBS["trait"][num_genes][has_trait]
+    return gene_prob * trait_prob
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Calcule e retorne uma probabilidade conjunta.
@@ -156,36 +351,29 @@ def joint_probability(people, one_gene, two_genes, have_trait):
 
 
     """
+    def num_genes(person):
+        if person in two_genes:
+            return 2
+        elif person in one_gene:
+            return 1
+        else:
+            return 0
+
     probability = 1
-    
+
     for person in people:
         mother = people[person]["mother"]
         father = people[person]["father"]
 
-        if person in two_genes:
-            num_genes = 2
-        elif person in one_gene:
-            num_genes = 1
-        else:
-            num_genes = 0
-        
         if mother is None and father is None:
-            gene_prob = PROBS["gene"][num_genes]
+            factor = person_factor(num_genes(person), person in have_trait,
+                                   None, None)
         else:
-            mother_prob = parents_prob(mother, two_genes, one_gene)
-            father_prob = parents_prob(father, two_genes, one_gene)
-
-            if num_genes == 2:
-                gene_prob = mother_prob * father_prob
-            elif num_genes == 1:
-                gene_prob = (mother_prob * (1 - father_prob)) + ((1 - mother_prob) * father_prob)
-            else:
-                gene_prob = (1 - father_prob) * (1 - mother_prob)
-        
-        trait_prob = PROBS["trait"][num_genes][person in have_trait]
-        
-        probability *= gene_prob * trait_prob  
-    return probability  
+            factor = person_factor(num_genes(person), person in have_trait,
+                                   num_genes(mother), num_genes(father))
+
+        probability *= factor
+    return probability
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
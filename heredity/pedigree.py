@@ -0,0 +1,274 @@
+import itertools
+import sys
+
+from heredity import PROBS, inherit_prob, load_data, print_probabilities
+
+# Número de cópias possíveis do gene
+GENES = (0, 1, 2)
+
+# Máximo de mensagens guardadas por aresta da árvore antes de limpar o cache
+CACHE_LIMIT = 4096
+
+
+def main():
+
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python pedigree.py data.csv")
+    people = load_data(sys.argv[1])
+
+    # Compile a família uma vez e consulte com a evidência do CSV
+    pedigree = Pedigree(people)
+    probabilities = pedigree.query()
+    print_probabilities(people, probabilities)
+
+
+def multiply(f, g):
+    """
+    Multiplique dois fatores. Um fator é um par (escopo, tabela), em que o
+    escopo é uma tupla de pessoas e a tabela mapeia tuplas de genes a valores.
+    """
+    fscope, ftable = f
+    gscope, gtable = g
+    scope = fscope + tuple(v for v in gscope if v not in fscope)
+    fidx = [scope.index(v) for v in fscope]
+    gidx = [scope.index(v) for v in gscope]
+    table = {}
+    for states in itertools.product(GENES, repeat=len(scope)):
+        table[states] = (ftable[tuple(states[i] for i in fidx)] *
+                         gtable[tuple(states[i] for i in gidx)])
+    return scope, table
+
+
+def sum_out(f, keep):
+    """
+    Some o fator `f` sobre todas as pessoas que não estão em `keep`.
+    """
+    scope, table = f
+    kept = tuple(v for v in scope if v in keep)
+    idx = [scope.index(v) for v in kept]
+    result = dict.fromkeys(itertools.product(GENES, repeat=len(kept)), 0)
+    for states, p in table.items():
+        result[tuple(states[i] for i in idx)] += p
+    return kept, result
+
+
+def elimination_order(graph):
+    """
+    Retorne uma ordem de eliminação pela heurística min-fill
+    (desempate pelo menor grau e depois pelo nome).
+    """
+    graph = {v: set(graph[v]) for v in graph}
+    order = []
+    while graph:
+        def fill(v):
+            return sum(1 for a, b in itertools.combinations(graph[v], 2)
+                       if b not in graph[a])
+        v = min(graph, key=lambda v: (fill(v), len(graph[v]), v))
+        for a, b in itertools.combinations(graph[v], 2):
+            graph[a].add(b)
+            graph[b].add(a)
+        for u in graph[v]:
+            graph[u].discard(v)
+        del graph[v]
+        order.append(v)
+    return order
+
+
+class Pedigree():
+
+    def __init__(self, people):
+        """
+        Compile a família `people` (no formato de `load_data`) em uma árvore de
+        junção: tabelas de probabilidade pré-calculadas para cada pessoa, uma
+        ordem de eliminação e um cache de mensagens entre os cliques.
+        """
+        self.people = people
+
+        # Tabelas de cada família (pessoa, mãe, pai), uma por valor de evidência
+        self.families = {
+            person: {
+                trait: self.family_factor(person, trait)
+                for trait in (None, True, False)
+            }
+            for person in people
+        }
+
+        # Grafo moral: cada pessoa ligada aos pais, e os pais ligados entre si
+        graph = {person: set() for person in people}
+        for person in people:
+            family = self.family_scope(person)
+            for a, b in itertools.combinations(family, 2):
+                graph[a].add(b)
+                graph[b].add(a)
+        self.order = elimination_order(graph)
+
+        # Um clique por variável eliminada; o pai de um clique é o clique da
+        # primeira variável (na ordem) entre os vizinhos restantes
+        position = {v: i for i, v in enumerate(self.order)}
+        self.cliques = []
+        self.parent = []
+        clique_of = {}
+        remaining = {v: set(graph[v]) for v in graph}
+        for v in self.order:
+            neighbors = sorted(remaining[v], key=position.get)
+            clique_of[v] = len(self.cliques)
+            self.cliques.append((v, *neighbors))
+            self.parent.append(neighbors[0] if neighbors else None)
+            for a, b in itertools.combinations(neighbors, 2):
+                remaining[a].add(b)
+                remaining[b].add(a)
+            for u in neighbors:
+                remaining[u].discard(v)
+            del remaining[v]
+        self.parent = [
+            clique_of[p] if p is not None else None for p in self.parent
+        ]
+        self.clique_of = clique_of
+
+        # Cada tabela de família vai para o clique da primeira pessoa eliminada
+        self.assigned = [[] for _ in self.cliques]
+        for person in people:
+            first = min(self.family_scope(person), key=position.get)
+            self.assigned[clique_of[first]].append(person)
+
+        # Vizinhos e separadores da árvore
+        self.neighbors = [[] for _ in self.cliques]
+        for c, p in enumerate(self.parent):
+            if p is not None:
+                self.neighbors[c].append(p)
+                self.neighbors[p].append(c)
+
+        # Pessoas cuja evidência influencia cada mensagem (lado de quem envia)
+        subtree = [set(persons) for persons in self.assigned]
+        for c, p in enumerate(self.parent):
+            if p is not None:
+                subtree[p] |= subtree[c]
+        component = list(subtree)
+        for c in reversed(range(len(self.cliques))):
+            p = self.parent[c]
+            if p is not None:
+                component[c] = component[p]
+        self.influence = {}
+        for c, p in enumerate(self.parent):
+            if p is not None:
+                self.influence[c, p] = tuple(sorted(subtree[c]))
+                self.influence[p, c] = tuple(sorted(component[c] - subtree[c]))
+        self.cache = {edge: {} for edge in self.influence}
+
+    def family_scope(self, person):
+        """Retorne a tupla (pessoa, mãe, pai), sem os pais desconhecidos."""
+        mother = self.people[person]["mother"]
+        father = self.people[person]["father"]
+        return tuple(v for v in (person, mother, father) if v is not None)
+
+    def family_factor(self, person, trait):
+        """
+        Retorne a tabela P(genes da pessoa | genes dos pais) multiplicada pela
+        probabilidade da característica observada `trait` (None se desconhecida).
+        """
+        scope = self.family_scope(person)
+        table = {}
+        for states in itertools.product(GENES, repeat=len(scope)):
+            num_genes = states[0]
+            if len(scope) == 1:
+                gene_prob = PROBS["gene"][num_genes]
+            else:
+                mother_prob = inherit_prob(states[1])
+                father_prob = inherit_prob(states[2])
+                if num_genes == 2:
+                    gene_prob = mother_prob * father_prob
+                elif num_genes == 1:
+                    gene_prob = (mother_prob * (1 - father_prob) +
+                                 (1 - mother_prob) * father_prob)
+                else:
+                    gene_prob = (1 - mother_prob) * (1 - father_prob)
+            if trait is not None:
+                gene_prob *= PROBS["trait"][num_genes][trait]
+            table[states] = gene_prob
+        return scope, table
+
+    def potential(self, clique, evidence):
+        """Retorne o produto das tabelas de família atribuídas ao clique."""
+        f = ((), {(): 1})
+        for person in self.assigned[clique]:
+            f = multiply(f, self.families[person][evidence.get(person)])
+        return f
+
+    def message(self, sender, receiver, evidence, messages):
+        """
+        Calcule (ou reaproveite do cache) a mensagem de `sender` para `receiver`.
+        A chave do cache é só a evidência das pessoas do lado de quem envia.
+        """
+        edge = sender, receiver
+        key = tuple(evidence.get(person) for person in self.influence[edge])
+        cache = self.cache[edge]
+        if key not in cache:
+            f = self.potential(sender, evidence)
+            for neighbor in self.neighbors[sender]:
+                if neighbor != receiver:
+                    f = multiply(f, messages[neighbor, sender])
+            if len(cache) >= CACHE_LIMIT:
+                cache.clear()
+            cache[key] = sum_out(f, self.cliques[receiver])
+        return cache[key]
+
+    def query(self, evidence=None):
+        """
+        Retorne as probabilidades a posteriori de genes e características de
+        cada pessoa, no mesmo formato (normalizado) de `heredity.py`.
+
+        `evidence` mapeia nomes para True/False (característica observada);
+        pessoas ausentes ficam sem evidência. Se `evidence` for None, usa a
+        coluna `trait` dos dados compilados.
+        """
+        if evidence is None:
+            evidence = {
+                person: self.people[person]["trait"] for person in self.people
+            }
+
+        # Passo de coleta (folhas para a raiz) e de distribuição (raiz para folhas)
+        messages = {}
+        for c, p in enumerate(self.parent):
+            if p is not None:
+                messages[c, p] = self.message(c, p, evidence, messages)
+        for c in reversed(range(len(self.cliques))):
+            p = self.parent[c]
+            if p is not None:
+                messages[p, c] = self.message(p, c, evidence, messages)
+
+        probabilities = {}
+        for person in self.people:
+            clique = self.clique_of[person]
+            belief = self.potential(clique, evidence)
+            for neighbor in self.neighbors[clique]:
+                belief = multiply(belief, messages[neighbor, clique])
+            _, table = sum_out(belief, (person,))
+            total = sum(table.values())
+            gene = {
+                genes: table[genes,] / total if total > 0 else 0
+                for genes in (2, 1, 0)
+            }
+
+            observed = evidence.get(person)
+            if observed is None:
+                has_trait = sum(
+                    gene[genes] * PROBS["trait"][genes][True] for genes in gene
+                )
+            else:
+                has_trait = 1 if observed else 0
+            probabilities[person] = {
+                "gene": gene,
+                "trait": {True: has_trait, False: 1 - has_trait}
+            }
+        return probabilities
+
+    def query_batch(self, evidences):
+        """
+        Responda várias consultas de uma vez, reaproveitando as mensagens em
+        cache entre cenários que compartilham parte da evidência.
+        """
+        return [self.query(evidence) for evidence in evidences]
+
+
+if __name__ == "__main__":
+    main()
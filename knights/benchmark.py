@@ -0,0 +1,164 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from logic import *
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Times the entailment backends on knights-and-knaves puzzles."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[3, 5, 10, 20, 50, 100, 200],
+                        help="number of inhabitants of each generated puzzle")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="nesting depth of each statement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--file", help="read a knowledge base from a text file "
+                                       "(one formula per line) instead")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS),
+                        choices=list(BACKENDS))
+    parser.add_argument("--max-exhaustive", type=int, default=20,
+                        help="largest symbol count for exhaustive backends")
+    parser.add_argument("--output", help="JSON Lines file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            knowledge = And(*[parse(line) for line in f if line.strip()])
+        problems = [({"file": args.file}, knowledge,
+                     [Symbol(name) for name in sorted(knowledge.symbols())])]
+    else:
+        problems = []
+        for n in args.sizes:
+            knowledge, symbols, _ = generate_puzzle(n, args.depth, args.seed)
+            problems.append(({"inhabitants": n, "depth": args.depth,
+                              "seed": args.seed}, knowledge, symbols))
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    for puzzle, knowledge, queries in problems:
+        puzzle["symbols"] = len(knowledge.symbols())
+        for record in run_backends(knowledge, queries, args.backends,
+                                   args.max_exhaustive):
+            print(json.dumps({"puzzle": puzzle, **record}), file=out)
+            out.flush()
+    if args.output:
+        out.close()
+
+
+def inhabitant(i):
+    """Returns the name of the i-th inhabitant: A to Z, then P26, P27..."""
+    return chr(ord("A") + i) if i < 26 else f"P{i}"
+
+
+def generate_puzzle(n, depth=2, seed=0):
+    """
+    Generates a random solvable knights-and-knaves puzzle with n inhabitants.
+
+    Each inhabitant is secretly a knight or a knave and makes one statement,
+    a random nested formula about who is a knight or a knave. Statements are
+    negated where needed so that knights tell the truth and knaves lie under
+    the secret solution, which is therefore always a model.
+
+    Returns the knowledge base, the list of query symbols and the solution
+    (a dict from symbol name to bool).
+    """
+    rng = random.Random(seed)
+    knights = [Symbol(f"{inhabitant(i)} is a Knight") for i in range(n)]
+    knaves = [Symbol(f"{inhabitant(i)} is a Knave") for i in range(n)]
+    is_knight = [rng.random() < 0.5 for _ in range(n)]
+    solution = dict()
+    for i in range(n):
+        solution[knights[i].name] = is_knight[i]
+        solution[knaves[i].name] = not is_knight[i]
+
+    def statement(depth):
+        if depth == 0:
+            i = rng.randrange(n)
+            return rng.choice([knights, knaves])[i]
+        kind = rng.randrange(5)
+        if kind == 0:
+            return Not(statement(depth - 1))
+        if kind == 1:
+            return And(statement(depth - 1), statement(depth - 1))
+        if kind == 2:
+            return Or(statement(depth - 1), statement(depth - 1))
+        if kind == 3:
+            return Implication(statement(depth - 1), statement(depth - 1))
+        return Biconditional(statement(depth - 1), statement(depth - 1))
+
+    knowledge = And()
+    for i in range(n):
+        says = statement(depth)
+        if says.evaluate(solution) != is_knight[i]:
+            says = Not(says)
+        knowledge.add(Or(knights[i], knaves[i]))
+        knowledge.add(Not(And(knights[i], knaves[i])))
+        knowledge.add(Implication(knights[i], says))
+        knowledge.add(Implication(knaves[i], Not(says)))
+    return knowledge, knights + knaves, solution
+
+
+def check_each(method):
+    """Returns a backend that calls model_check once per query."""
+    def backend(knowledge, queries):
+        return [model_check(knowledge, query, method) for query in queries]
+    return backend
+
+
+def ask_each(knowledge, queries):
+    """Answers every query with one incremental KnowledgeBase."""
+    kb = KnowledgeBase(knowledge)
+    return [kb.ask(query) for query in queries]
+
+
+# Backends, and whether each one enumerates every model
+BACKENDS = {
+    "sat": (check_each("sat"), False),
+    "many": (model_check_many, False),
+    "kb": (ask_each, False),
+    "enumerate": (check_each("enumerate"), True),
+    "compiled": (check_each("compiled"), True),
+    "bitwise": (check_each("bitwise"), True),
+    "parallel": (check_each("parallel"), True),
+}
+
+
+def run_backends(knowledge, queries, backends, max_exhaustive):
+    """
+    Runs each backend on every query and yields one record per backend,
+    with wall time, peak memory (Python allocations in this process, from
+    tracemalloc, in a second run) and whether its answers agree with the
+    first backend that ran.
+    """
+    symbols = len(knowledge.symbols())
+    reference = None
+    for name in backends:
+        backend, exhaustive = BACKENDS[name]
+        if exhaustive and symbols > max_exhaustive:
+            yield {"backend": name, "skipped": True}
+            continue
+
+        start = time.perf_counter()
+        answers = backend(knowledge, queries)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        backend(knowledge, queries)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if reference is None:
+            reference = answers
+        yield {"backend": name, "skipped": False, "seconds": seconds,
+               "peak_bytes": peak, "entailed": sum(answers),
+               "agrees": answers == reference}
+
+
+if __name__ == "__main__":
+    main()
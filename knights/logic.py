@@ -1,19 +1,119 @@
+import collections
+import heapq
 import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import weakref
 
 
 class Sentence():
 
+    # Structurally equal sentences share one instance (hash-consing)
+    interned = weakref.WeakValueDictionary()
+
+    # Cached structural data, filled in lazily
+    _hash = None
+    _symbols = None
+    _compiled = None
+    _simplified = None
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence under a partial model, in three-valued
+        logic: returns True or False if every completion of the model agrees,
+        and None if the value is still unknown.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns the symbols in the sentence as a cached frozenset."""
+        if self._symbols is None:
+            self._symbols = frozenset().union(
+                *[child.symbol_set() for child in self.children()]
+            )
+        return self._symbols
+
+    def children(self):
+        """Returns the immediate subsentences."""
+        return ()
+
+    def canonical(self):
+        """Returns the shared instance structurally equal to this sentence."""
+        return self
+
+    def simplify(self):
+        """
+        Returns an equivalent sentence with nested conjunctions and
+        disjunctions flattened, duplicates removed, constants folded and
+        implications rewritten as disjunctions. TRUE (the empty And) and
+        FALSE (the empty Or) stand for tautologies and contradictions.
+        Simplifying may drop symbols that do not affect the value.
+        """
+        if self._simplified is None:
+            self._simplified = self.simplified()
+        return self._simplified
+
+    def simplified(self):
+        """Computes the result of simplify(), without caching it."""
+        return self
+
+    def expression(self, positions):
+        """
+        Returns a Python expression that evaluates the sentence over an
+        integer model m, where symbol s is true iff bit positions[s] is set.
+        """
+        raise Exception("nothing to compile")
+
+    def truth_table(self, columns, full):
+        """
+        Returns the truth table of the sentence as a bit-vector: bit m is
+        the value of the sentence in model m. columns maps each symbol name
+        to its column (see truth_columns) and full has all 2^n bits set.
+        """
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols=None):
+        """
+        Compiles the sentence into an Evaluator over a fixed symbol ordering
+        (sorted symbol names by default).
+        """
+        if symbols is None:
+            symbols = sorted(self.symbol_set())
+        symbols = tuple(symbols)
+        if self._compiled is None:
+            self._compiled = dict()
+        if symbols not in self._compiled:
+            if len(self._compiled) >= 8:
+                self._compiled.clear()
+            self._compiled[symbols] = Evaluator(self, symbols)
+        return self._compiled[symbols]
+
+    @classmethod
+    def intern(cls, key, build):
+        """
+        Returns the shared instance of cls for key. If there is none yet,
+        creates one and initializes it with build(sentence).
+        """
+        sentence = Sentence.interned.get((cls, key))
+        if sentence is None:
+            sentence = object.__new__(cls)
+            build(sentence)
+            Sentence.interned[cls, key] = sentence
+        return sentence
 
     @classmethod
     def validate(cls, sentence):
@@ -44,14 +144,23 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        def build(sentence):
+            sentence.name = name
+            sentence._hash = hash(("symbol", name))
+            sentence._symbols = frozenset([name])
+        return cls.intern(name, build)
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self._hash
+
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -62,50 +171,119 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
     def symbols(self):
         return {self.name}
 
+    def symbol_set(self):
+        return self._symbols
+
+    def expression(self, positions):
+        try:
+            return f"(m & {1 << positions[self.name]} != 0)"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def truth_table(self, columns, full):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
 
 class Not(Sentence):
-    def __init__(self, operand):
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        operand = operand.canonical()
+
+        def build(sentence):
+            sentence.operand = operand
+            sentence._hash = hash(("not", hash(operand)))
+        return cls.intern((operand,), build)
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self._hash
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
+
+    def children(self):
+        return (self.operand,)
 
     def __repr__(self):
         return f"Not({self.operand})"
 
+    def simplified(self):
+        return negate(self.operand.simplify())
+
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def expression(self, positions):
+        return f"(not {self.operand.expression(positions)})"
+
+    def truth_table(self, columns, full):
+        return full ^ self.operand.truth_table(columns, full)
 
 
 class And(Sentence):
+
+    # Conjunctions can grow with add(), so only the copies used as
+    # subsentences are interned, and those are frozen
+    frozen = False
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+        self.conjuncts = [conjunct.canonical() for conjunct in conjuncts]
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And)
+            and hash(self) == hash(other)
+            and self.conjuncts == other.conjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        if self._hash is None:
+            self._hash = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self._hash
+
+    def __reduce__(self):
+        return (And, tuple(self.conjuncts))
+
+    def children(self):
+        return self.conjuncts
+
+    def canonical(self):
+        if self.frozen:
+            return self
+        conjuncts = list(self.conjuncts)
+
+        def build(sentence):
+            sentence.conjuncts = conjuncts
+            sentence.frozen = True
+        return And.intern(tuple(conjuncts), build)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,150 +292,1329 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        if self.frozen:
+            raise TypeError("cannot add to a shared conjunction")
         Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        self.conjuncts.append(conjunct.canonical())
+        self._hash = self._symbols = self._compiled = self._simplified = None
+
+    def simplified(self):
+        return conjoin([conjunct.simplify() for conjunct in self.conjuncts])
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def expression(self, positions):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            conjunct.expression(positions) for conjunct in self.conjuncts
+        ) + ")"
+
+    def truth_table(self, columns, full):
+        table = full
+        for conjunct in self.conjuncts:
+            table &= conjunct.truth_table(columns, full)
+        return table
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        disjuncts = [disjunct.canonical() for disjunct in disjuncts]
+
+        def build(sentence):
+            sentence.disjuncts = disjuncts
+            sentence._hash = hash(
+                ("or", tuple(hash(disjunct) for disjunct in disjuncts))
+            )
+        return cls.intern(tuple(disjuncts), build)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or)
+            and hash(self) == hash(other)
+            and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self._hash
+
+    def __reduce__(self):
+        return (Or, tuple(self.disjuncts))
+
+    def children(self):
+        return self.disjuncts
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
+    def simplified(self):
+        return disjoin([disjunct.simplify() for disjunct in self.disjuncts])
+
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def expression(self, positions):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            disjunct.expression(positions) for disjunct in self.disjuncts
+        ) + ")"
+
+    def truth_table(self, columns, full):
+        table = 0
+        for disjunct in self.disjuncts:
+            table |= disjunct.truth_table(columns, full)
+        return table
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        antecedent = antecedent.canonical()
+        consequent = consequent.canonical()
+
+        def build(sentence):
+            sentence.antecedent = antecedent
+            sentence.consequent = consequent
+            sentence._hash = hash(
+                ("implies", hash(antecedent), hash(consequent))
+            )
+        return cls.intern((antecedent, consequent), build)
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self._hash
+
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
+
+    def children(self):
+        return (self.antecedent, self.consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
+    def simplified(self):
+        return disjoin([negate(self.antecedent.simplify()),
+                        self.consequent.simplify()])
+
     def evaluate(self, model):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is True and consequent is False:
+            return False
+        return None
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def expression(self, positions):
+        antecedent = self.antecedent.expression(positions)
+        consequent = self.consequent.expression(positions)
+        return f"(not {antecedent} or {consequent})"
+
+    def truth_table(self, columns, full):
+        antecedent = self.antecedent.truth_table(columns, full)
+        consequent = self.consequent.truth_table(columns, full)
+        return (full ^ antecedent) | consequent
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        left = left.canonical()
+        right = right.canonical()
+
+        def build(sentence):
+            sentence.left = left
+            sentence.right = right
+            sentence._hash = hash(("biconditional", hash(left), hash(right)))
+        return cls.intern((left, right), build)
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self._hash
+
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
+
+    def children(self):
+        return (self.left, self.right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
+    def simplified(self):
+        left = self.left.simplify()
+        right = self.right.simplify()
+        if left is TRUE:
+            return right
+        if right is TRUE:
+            return left
+        if left is FALSE:
+            return negate(right)
+        if right is FALSE:
+            return negate(left)
+        if left == right:
+            return TRUE
+        if left == negate(right):
+            return FALSE
+        return Biconditional(left, right)
+
     def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+        return self.left.evaluate(model) == self.right.evaluate(model)
+
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
+    def expression(self, positions):
+        left = self.left.expression(positions)
+        right = self.right.expression(positions)
+        return f"({left} == {right})"
+
+    def truth_table(self, columns, full):
+        left = self.left.truth_table(columns, full)
+        right = self.right.truth_table(columns, full)
+        return full ^ left ^ right
+
+
+# Constants, as the empty conjunction and the empty disjunction
+TRUE = And().canonical()
+FALSE = Or()
+
+
+def negate(sentence):
+    """Returns the negation of a simplified sentence, simplified."""
+    if sentence is TRUE:
+        return FALSE
+    if sentence is FALSE:
+        return TRUE
+    if isinstance(sentence, Not):
+        return sentence.operand
+    return Not(sentence)
+
+
+def conjoin(conjuncts):
+    """
+    Returns the simplified conjunction of simplified sentences: nested
+    conjunctions are flattened, TRUE and duplicates dropped, and FALSE or a
+    sentence together with its negation makes the whole conjunction FALSE.
+    """
+    flat = dict()
+    for conjunct in conjuncts:
+        for c in (conjunct.conjuncts if isinstance(conjunct, And) else [conjunct]):
+            if c is FALSE or negate(c) in flat:
+                return FALSE
+            flat[c] = True
+    if len(flat) == 1:
+        return next(iter(flat))
+    return And(*flat).canonical()
+
+
+def disjoin(disjuncts):
+    """
+    Returns the simplified disjunction of simplified sentences: nested
+    disjunctions are flattened, FALSE and duplicates dropped, and TRUE or a
+    sentence together with its negation makes the whole disjunction TRUE.
+    """
+    flat = dict()
+    for disjunct in disjuncts:
+        for d in (disjunct.disjuncts if isinstance(disjunct, Or) else [disjunct]):
+            if d is TRUE or negate(d) in flat:
+                return TRUE
+            flat[d] = True
+    if len(flat) == 1:
+        return next(iter(flat))
+    return Or(*flat)
+
+
+class Evaluator():
+
+    def __init__(self, sentence, symbols):
+        """
+        A sentence compiled into a single Python function of an integer
+        model: bit i of the model is the value of symbols[i].
+        """
+        self.symbols = tuple(symbols)
+        self.positions = {name: i for i, name in enumerate(self.symbols)}
+        self.source = sentence.expression(self.positions)
+        self.function = eval(f"lambda m: {self.source}")
+
+    def __call__(self, m):
+        return self.function(m)
+
+    def mask(self, model):
+        """Converts a model dict (symbol name to bool) to an integer model."""
+        m = 0
+        for name, i in self.positions.items():
+            try:
+                if model[name]:
+                    m |= 1 << i
+            except KeyError:
+                raise Exception(f"variable {name} not in model")
+        return m
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def evaluate(self, model):
+        """Evaluates the compiled sentence on a model dict."""
+        return self.function(self.mask(model))
+
+
+# Operator spellings accepted by parse(), by token kind
+OPERATORS = {
+    "<=>": "iff", "<->": "iff", "⇔": "iff",
+    "=>": "implies", "->": "implies", "⇒": "implies",
+    "∨": "or", "|": "or", "or": "or",
+    "∧": "and", "&": "and", "and": "and",
+    "¬": "not", "~": "not", "!": "not", "not": "not",
+    "(": "(", ")": ")",
+}
+
+TOKEN = re.compile(
+    r'\s*(?:(<=>|<->|=>|->|[⇔⇒∨∧¬~!|&()])|"([^"]*)"|([A-Za-z_][A-Za-z0-9_]*))'
+)
+
+
+def tokenize(text):
+    """
+    Splits text into (kind, value) tokens. Consecutive bare words are joined
+    into one symbol name, so formulas printed by formula() can be parsed back.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f"unexpected character at position {position}: "
+                             f"{text[position:position + 10]!r}")
+        position = match.end()
+        operator, quoted, word = match.groups()
+        if operator is not None:
+            tokens.append((OPERATORS[operator], operator))
+        elif quoted is not None:
+            tokens.append(("symbol", quoted))
+        elif word in OPERATORS:
+            tokens.append((OPERATORS[word], word))
+        elif tokens and tokens[-1][0] == "word":
+            tokens[-1] = ("word", f"{tokens[-1][1]} {word}")
+        else:
+            tokens.append(("word", word))
+    return [("symbol", value) if kind == "word" else (kind, value)
+            for kind, value in tokens]
+
+
+def parse(text):
+    """
+    Parses a propositional formula into a Sentence.
+
+    Operators, from loosest to tightest binding: <=> (also <->, ⇔),
+    => (also ->, ⇒, right associative), or (∨, |), and (∧, &) and
+    not (¬, ~, !). Symbol names are bare words (several words in a row
+    form one name) or double-quoted strings.
+    """
+    tokens = tokenize(text)
+    position = 0
+
+    def peek():
+        return tokens[position][0] if position < len(tokens) else None
+
+    def expect(kind):
+        nonlocal position
+        if peek() != kind:
+            found = tokens[position][1] if position < len(tokens) else "end"
+            raise ValueError(f"expected {kind}, found {found!r}")
+        position += 1
+        return tokens[position - 1][1]
+
+    def biconditional():
+        sentence = implication()
+        while peek() == "iff":
+            expect("iff")
+            sentence = Biconditional(sentence, implication())
+        return sentence
+
+    def implication():
+        sentence = disjunction()
+        if peek() == "implies":
+            expect("implies")
+            return Implication(sentence, implication())
+        return sentence
+
+    def disjunction():
+        disjuncts = [conjunction()]
+        while peek() == "or":
+            expect("or")
+            disjuncts.append(conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction():
+        conjuncts = [negation()]
+        while peek() == "and":
+            expect("and")
+            conjuncts.append(negation())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def negation():
+        if peek() == "not":
+            expect("not")
+            return Not(negation())
+        if peek() == "(":
+            expect("(")
+            sentence = biconditional()
+            expect(")")
+            return sentence
+        return Symbol(expect("symbol"))
+
+    sentence = biconditional()
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position][1]!r}")
+    return sentence
+
+
+def model_check(knowledge, query, method="sat"):
+    """
+    Checks if knowledge base entails query.
+
+    method selects the engine: "sat" (the default) tests that
+    knowledge ∧ ¬query is unsatisfiable, "bitwise" evaluates all models at
+    once as truth-table bit-vectors, "parallel" splits the bitwise check
+    into subspaces across processes, "compiled" checks every model with a
+    compiled evaluator and "enumerate" walks every model with
+    Sentence.evaluate. Both sentences are simplified first.
+    """
+    return METHODS[method](knowledge.simplify(), query.simplify())
+
+
+def model_check_sat(knowledge, query):
+    """
+    Checks if knowledge base entails query, by testing that
+    knowledge ∧ ¬query is unsatisfiable.
+    """
+    solver = Solver()
+    encoder = Encoder(solver)
+    encoder.add(knowledge)
+    return not solver.solve([-encoder.literal(query)])
+
+
+def model_check_enumerate(knowledge, query):
+    """
+    Checks if knowledge base entails query, by enumerating models. Partial
+    models are evaluated with three-valued logic, so a subtree is skipped
+    as soon as the knowledge base is false (or the query is decided) in it.
+    """
 
     def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+        """Checks if knowledge base entails query, given a partial model."""
 
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
+        # If knowledge base is false in every completion, nothing to check
+        kb = knowledge.evaluate_partial(model)
+        if kb is False:
             return True
-        else:
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+        # If knowledge base is true, query must also be true
+        if kb is True:
+            result = query.evaluate_partial(model)
+            if result is not None:
+                return result
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+        # Choose the next symbol, most frequent first
+        p = symbols[len(model)]
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+        # Ensure entailment holds with the symbol true and false
+        model[p] = True
+        holds = check_all(knowledge, query, symbols, model)
+        if holds:
+            model[p] = False
+            holds = check_all(knowledge, query, symbols, model)
+        del model[p]
+        return holds
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    # Get all symbols in both knowledge and query, by occurrence frequency
+    counts = symbol_frequencies(knowledge, query)
+    symbols = sorted(counts, key=lambda name: (-counts[name], name))
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def symbol_frequencies(*sentences):
+    """Returns a Counter of how many times each symbol occurs in sentences."""
+    counts = collections.Counter()
+    stack = list(sentences)
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, Symbol):
+            counts[sentence.name] += 1
+        else:
+            stack.extend(sentence.children())
+    return counts
+
+
+def model_check_compiled(knowledge, query):
+    """
+    Checks if knowledge base entails query, by evaluating the compiled
+    sentence knowledge => query on every integer model.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    holds = Implication(knowledge, query).compile(symbols).function
+    return all(map(holds, range(1 << len(symbols))))
+
+
+# Truth tables take 2^n bits, so bit-parallel checking stops here
+MAX_TABLE_SYMBOLS = 30
+
+
+def truth_columns(symbols):
+    """
+    Returns the truth-table columns for a list of symbol names, as a dict
+    from name to a 2^n-bit integer whose bit m is set iff symbol i is true
+    in model m (bit i of m), together with the all-ones mask.
+    """
+    n = len(symbols)
+    if n > MAX_TABLE_SYMBOLS:
+        raise ValueError(f"too many symbols for a truth table: {n}")
+    size = 1 << n
+    columns = dict()
+    for i, name in enumerate(symbols):
+        half = 1 << i
+        column = ((1 << half) - 1) << half
+        width = 2 * half
+        while width < size:
+            column |= column << width
+            width *= 2
+        columns[name] = column
+    return columns, (1 << size) - 1
+
+
+def model_check_bitwise(knowledge, query):
+    """
+    Checks if knowledge base entails query by evaluating both over all 2^n
+    models at once, as bitwise operations on truth-table columns.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    columns, full = truth_columns(symbols)
+    kb = knowledge.truth_table(columns, full)
+    q = query.truth_table(columns, full)
+    return (kb & (full ^ q)) == 0
+
+
+class KnowledgeBase():
+
+    def __init__(self, *sentences):
+        """
+        A knowledge base that grows with tell() and answers ask() queries
+        incrementally. One SAT solver is kept across calls, so the CNF of
+        every told sentence and all learnt clauses are reused; each query is
+        answered by solving under the assumption that it is false.
+        """
+        self.sentences = []
+        self.solver = Solver()
+        self.encoder = Encoder(self.solver)
+        self.cache = dict()
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def tell(self, sentence):
+        """Adds sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        sentence = sentence.canonical()
+        self.sentences.append(sentence)
+        self.encoder.add(sentence.simplify())
+
+        # Entailment is monotonic: only negative answers can change
+        self.cache = {
+            query: entailed for query, entailed in self.cache.items() if entailed
+        }
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        Sentence.validate(query)
+        query = query.canonical()
+        if query not in self.cache:
+            lit = self.encoder.literal(query.simplify())
+            self.cache[query] = not self.solver.solve([-lit])
+        return self.cache[query]
+
+    def consistent(self):
+        """Checks if the knowledge base has at least one model."""
+        return self.solver.solve()
+
+
+class ClauseList():
+
+    def __init__(self):
+        """Collects the clauses written by an Encoder, without solving them."""
+        self.num_vars = 0
+        self.clauses = []
+
+    def new_var(self):
+        self.num_vars += 1
+        return self.num_vars
+
+    def add_clause(self, literals):
+        self.clauses.append(frozenset(literals))
+        return True
+
+
+def count_models(knowledge):
+    """
+    Returns the number of models of the knowledge base over its symbols.
+
+    The Tseitin variables of the CNF are fully defined by the symbols, so
+    counting CNF models counts the models of the knowledge base. Counting
+    splits the clauses into independent components, multiplies their
+    counts and caches the count of every component it has seen.
+    """
+    cnf = ClauseList()
+    encoder = Encoder(cnf)
+    encoder.add(knowledge.simplify())
+
+    # Symbols dropped by simplification are free
+    for name in knowledge.symbol_set():
+        encoder.variable(name)
+    variables = frozenset(range(1, cnf.num_vars + 1))
+    return count_clauses(frozenset(cnf.clauses), variables, dict())
+
+
+def assign(clauses, literals):
+    """
+    Returns clauses simplified by making every literal in literals true,
+    or None if that falsifies a clause.
+    """
+    falsified = {-lit for lit in literals}
+    simplified = set()
+    for clause in clauses:
+        if not clause.isdisjoint(literals):
+            continue
+        if not clause.isdisjoint(falsified):
+            clause = clause - falsified
+            if not clause:
+                return None
+        simplified.add(clause)
+    return frozenset(simplified)
+
+
+def propagate_units(clauses):
+    """
+    Applies unit propagation to clauses. Returns the simplified clauses and
+    the set of literals made true, or None if a clause is falsified.
+    """
+    occurrences = collections.defaultdict(list)
+    for clause in clauses:
+        for lit in clause:
+            occurrences[lit].append(clause)
+    remaining = {clause: len(clause) for clause in clauses}
+    satisfied = set()
+    assigned = set()
+    queue = [lit for clause in clauses if len(clause) == 1 for lit in clause]
+    while queue:
+        lit = queue.pop()
+        if lit in assigned:
+            continue
+        if -lit in assigned:
+            return None
+        assigned.add(lit)
+        satisfied.update(occurrences[lit])
+        for clause in occurrences[-lit]:
+            if clause in satisfied:
+                continue
+            remaining[clause] -= 1
+            if remaining[clause] == 0:
+                return None
+            if remaining[clause] == 1:
+                queue.extend(
+                    other for other in clause
+                    if other not in assigned and -other not in assigned
+                )
+    if not assigned:
+        return clauses, assigned
+    return assign(clauses, assigned), assigned
+
+
+def count_clauses(clauses, variables, cache):
+    """Counts the assignments to variables that satisfy every clause."""
+    if frozenset() in clauses:
+        return 0
+
+    # Unit propagation
+    propagated = propagate_units(clauses)
+    if propagated is None:
+        return 0
+    clauses, units = propagated
+    variables = variables - {abs(lit) for lit in units}
+
+    # Variables in no clause are free
+    used = set()
+    for clause in clauses:
+        used.update(abs(lit) for lit in clause)
+    count = 2 ** len(variables - used)
+
+    # Independent components, by union-find over shared variables
+    parent = {v: v for v in used}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for clause in clauses:
+        first, *rest = [abs(lit) for lit in clause]
+        for v in rest:
+            parent[find(v)] = find(first)
+    components = collections.defaultdict(set)
+    for clause in clauses:
+        components[find(abs(next(iter(clause))))].add(clause)
+
+    for component in components.values():
+        component = frozenset(component)
+        if component not in cache:
+            cache[component] = count_component(component, cache)
+        count *= cache[component]
+        if count == 0:
+            return 0
+    return count
+
+
+def count_component(clauses, cache):
+    """Counts the models of a connected set of clauses over its variables."""
+
+    # Unsatisfiable components are cut off by the SAT solver up front,
+    # instead of being refuted one branch at a time
+    solver = Solver()
+    numbering = dict()
+    for clause in clauses:
+        for lit in clause:
+            if abs(lit) not in numbering:
+                numbering[abs(lit)] = solver.new_var()
+        solver.add_clause(
+            [numbering[abs(lit)] if lit > 0 else -numbering[abs(lit)] for lit in clause]
+        )
+    if not solver.solve():
+        return 0
+
+    occurrences = collections.Counter(abs(lit) for clause in clauses for lit in clause)
+    variables = frozenset(occurrences)
+    v = max(occurrences, key=lambda u: (occurrences[u], -u))
+    count = 0
+    for lit in (v, -v):
+        simplified = assign(clauses, {lit})
+        if simplified is not None:
+            count += count_clauses(simplified, variables - {v}, cache)
+    return count
+
+
+def iter_models(knowledge):
+    """
+    Yields every model of the knowledge base, as a dict from symbol name to
+    bool, one at a time. Each model found by the SAT solver is followed by
+    searches for the models that first differ from it at each later symbol,
+    so every model is produced exactly once without storing earlier ones.
+    """
+    solver = Solver()
+    encoder = Encoder(solver)
+    encoder.add(knowledge.simplify())
+    symbols = sorted(knowledge.symbol_set())
+    variables = [encoder.variable(name) for name in symbols]
+
+    stack = [[]]
+    while stack:
+        prefix = stack.pop()
+        if not solver.solve(prefix):
+            continue
+        model = [v if solver.model[v] else -v for v in variables]
+        yield {name: lit > 0 for name, lit in zip(symbols, model)}
+        for j in range(len(prefix), len(model)):
+            stack.append(model[:j] + [-model[j]])
+
+
+# Each parallel subspace is checked as a truth table over at most this many
+# free symbols; the rest are fixed per subspace
+SUBSPACE_SYMBOLS = 20
+
+
+def model_check_parallel(knowledge, query, processes=None):
+    """
+    Checks if knowledge base entails query by splitting the models into
+    subspaces, one per combination of values of the first k symbols, and
+    checking each subspace as a truth table in a worker process. Worker w
+    checks every processes-th subspace starting at w and sends its answer
+    through its own pipe. All workers are killed as soon as one of them
+    finds a counterexample.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+
+    # Fix enough symbols for a few subspaces per process
+    k = max(len(symbols) - SUBSPACE_SYMBOLS, 0)
+    while (1 << k) < 4 * processes and k < len(symbols):
+        k += 1
+    free = len(symbols) - k
+    subspaces = range(1 << k)
+    initargs = (knowledge, query, symbols, free)
+
+    if processes == 1:
+        init_subspace_worker(*initargs)
+        return all(map(check_subspace, subspaces))
+
+    # Each worker has its own pipe, so killing a worker while it sends
+    # cannot block the others or this process
+    workers = []
+    receivers = []
+    try:
+        for w in range(processes):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            worker = multiprocessing.Process(
+                target=subspace_worker,
+                args=(initargs, subspaces[w::processes], sender),
+                daemon=True,
+            )
+            worker.start()
+            sender.close()
+            workers.append(worker)
+            receivers.append(receiver)
+
+        pending = list(receivers)
+        while pending:
+            for receiver in multiprocessing.connection.wait(pending):
+                pending.remove(receiver)
+                try:
+                    holds = receiver.recv()
+                except EOFError:
+                    raise RuntimeError("a subspace worker exited without an answer")
+                if not holds:
+                    return False
+        return True
+    finally:
+        for worker in workers:
+            worker.kill()
+        for worker in workers:
+            worker.join()
+        for receiver in receivers:
+            receiver.close()
+
+
+# Problem being checked by this worker process (see init_subspace_worker)
+subspace_problem = None
+
+
+def init_subspace_worker(knowledge, query, symbols, free):
+    """Prepares a worker process to check subspaces of one problem."""
+    global subspace_problem
+    columns, full = truth_columns(symbols[:free])
+    subspace_problem = (knowledge, query, symbols[free:], columns, full)
+
+
+def subspace_worker(initargs, subspaces, connection):
+    """
+    Checks the given subspaces in a worker process and sends whether the
+    query holds in all of them, stopping at the first counterexample.
+    """
+    init_subspace_worker(*initargs)
+    connection.send(all(map(check_subspace, subspaces)))
+    connection.close()
+
+
+def check_subspace(i):
+    """
+    Checks entailment in subspace i, where bit j of i is the value of the
+    j-th fixed symbol.
+    """
+    knowledge, query, fixed, columns, full = subspace_problem
+    columns = dict(columns)
+    for j, name in enumerate(fixed):
+        columns[name] = full if (i >> j) & 1 else 0
+    kb = knowledge.truth_table(columns, full)
+    q = query.truth_table(columns, full)
+    return (kb & (full ^ q)) == 0
+
+
+# Up to this many symbols, model_check_many uses one truth table for the KB
+MANY_TABLE_SYMBOLS = 20
+
+
+def model_check_many(knowledge, queries):
+    """
+    Checks which of queries the knowledge base entails, returning a list of
+    booleans in the same order.
+
+    Small problems find the models of the KB once, as a truth table, and
+    test every query against it. Larger ones compute the backbone with one
+    SAT solver: each model found rules out every query false in it, and
+    only the remaining candidates need an UNSAT check.
+    """
+    knowledge = knowledge.simplify()
+    queries = [query.simplify() for query in queries]
+    symbols = sorted(knowledge.symbol_set().union(
+        *[query.symbol_set() for query in queries]
+    ))
+
+    if len(symbols) <= MANY_TABLE_SYMBOLS:
+        columns, full = truth_columns(symbols)
+        kb = knowledge.truth_table(columns, full)
+        return [
+            (kb & (full ^ query.truth_table(columns, full))) == 0
+            for query in queries
+        ]
+
+    solver = Solver()
+    encoder = Encoder(solver)
+    encoder.add(knowledge)
+    literals = [encoder.literal(query) for query in queries]
+    if not solver.solve():
+        return [True for query in queries]
+
+    # Candidates are the query literals true in every model seen so far
+    entailed = dict()
+    candidates = set()
+    for lit in literals:
+        if solver.model[abs(lit)] == (lit > 0):
+            candidates.add(lit)
+        else:
+            entailed[lit] = False
+    while candidates:
+        lit = candidates.pop()
+        if solver.solve([-lit]):
+            entailed[lit] = False
+            for other in list(candidates):
+                if solver.model[abs(other)] != (other > 0):
+                    candidates.discard(other)
+                    entailed[other] = False
+        else:
+            entailed[lit] = True
+    return [entailed[lit] for lit in literals]
+
+
+METHODS = {
+    "sat": model_check_sat,
+    "compiled": model_check_compiled,
+    "bitwise": model_check_bitwise,
+    "parallel": model_check_parallel,
+    "enumerate": model_check_enumerate,
+}
+
+
+class Encoder():
+
+    def __init__(self, solver):
+        """
+        Converts sentences into CNF clauses for `solver` using the Tseitin
+        encoding: every compound subformula gets a fresh variable defined to
+        be equivalent to it, so the CNF grows linearly with the formula.
+        """
+        self.solver = solver
+        self.variables = dict()
+        self.literals = dict()
+        self.true = None
+
+    def variable(self, name):
+        """Returns the solver variable for the symbol called name."""
+        if name not in self.variables:
+            self.variables[name] = self.solver.new_var()
+        return self.variables[name]
+
+    def add(self, sentence):
+        """Asserts that sentence is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        elif isinstance(sentence, Implication):
+            self.solver.add_clause([-self.literal(sentence.antecedent),
+                                    self.literal(sentence.consequent)])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to sentence, adding its definition."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        add = self.solver.add_clause
+        if isinstance(sentence, And):
+            children = [self.literal(c) for c in sentence.conjuncts]
+            if len(children) == 1:
+                return children[0]
+            if not children:
+                return self.constant()
+            x = self.solver.new_var()
+            for c in children:
+                add([-x, c])
+            add([x] + [-c for c in children])
+        elif isinstance(sentence, Or):
+            children = [self.literal(d) for d in sentence.disjuncts]
+            if len(children) == 1:
+                return children[0]
+            if not children:
+                return -self.constant()
+            x = self.solver.new_var()
+            for d in children:
+                add([x, -d])
+            add([-x] + children)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            x = self.solver.new_var()
+            add([-x, -a, b])
+            add([x, a])
+            add([x, -b])
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            x = self.solver.new_var()
+            add([-x, -a, b])
+            add([-x, a, -b])
+            add([x, a, b])
+            add([x, -a, -b])
+        else:
+            raise TypeError(f"cannot encode {sentence!r}")
+        self.literals[sentence] = x
+        return x
+
+    def constant(self):
+        """Returns a literal that is always true."""
+        if self.true is None:
+            self.true = self.solver.new_var()
+            self.solver.add_clause([self.true])
+        return self.true
+
+
+def luby(i):
+    """Returns the i-th element (from 1) of the Luby restart sequence."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class Solver():
+
+    RESTART_BASE = 100
+    VAR_DECAY = 0.95
+
+    def __init__(self):
+        """
+        CDCL SAT solver over integer literals (variable v is v, its negation
+        is -v), with two watched literals per clause, first-UIP clause
+        learning, non-chronological backjumping, VSIDS branching with phase
+        saving, Luby restarts and solving under assumptions.
+        """
+        self.num_vars = 0
+        self.clauses = []
+        self.learnts = []
+        self.watches = dict()
+        self.value = dict()
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.polarity = [False]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.heap = []
+        self.var_inc = 1.0
+        self.ok = True
+        self.model = None
+
+    def new_var(self):
+        """Creates a new variable and returns it."""
+        self.num_vars += 1
+        v = self.num_vars
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.polarity.append(False)
+        self.watches[v] = []
+        self.watches[-v] = []
+        heapq.heappush(self.heap, (0.0, v))
+        return v
+
+    def add_clause(self, literals):
+        """Adds a clause (an iterable of literals) to the solver."""
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        clause = []
+        for lit in literals:
+            if -lit in clause or self.value.get(lit) is True:
+                return True
+            if lit not in clause and self.value.get(lit) is None:
+                clause.append(lit)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(clause)
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+        return self.ok
+
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def enqueue(self, lit, reason):
+        v = abs(lit)
+        self.value[lit] = True
+        self.value[-lit] = False
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """Propagates unit clauses; returns a conflicting clause or None."""
+        value = self.value
+        watches = self.watches
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watching = watches[false_lit]
+            kept = []
+            for i, clause in enumerate(watching):
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value.get(first) is True:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if value.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value.get(first) is False:
+                        kept.extend(watching[i + 1:])
+                        watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        return clause
+                    self.enqueue(first, clause)
+            watches[false_lit] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a first-UIP learnt clause from a conflict. Returns the clause
+        (asserting literal first) and the level to backjump to.
+        """
+        seen = set()
+        learnt = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+        current = self.decision_level()
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[abs(lit)]
+        learnt[0] = -lit
+
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[u], u) for _, u in self.heap]
+            heapq.heapify(self.heap)
+        heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def backtrack(self, level):
+        """Undoes all assignments above the given decision level."""
+        if self.decision_level() <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            del self.value[lit]
+            del self.value[-lit]
+            self.reason[v] = None
+            self.polarity[v] = lit > 0
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch(self):
+        """Returns the unassigned variable with highest activity, or None."""
+        while self.heap:
+            _, v = heapq.heappop(self.heap)
+            if v not in self.value:
+                return v
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        assumptions true, and False otherwise. On success, the satisfying
+        assignment is kept in self.model as a dict from variable to bool.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        assumptions = list(assumptions)
+        restarts = 0
+        conflicts = 0
+        limit = Solver.RESTART_BASE * luby(1)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if self.decision_level() == 0:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.enqueue(learnt[0], learnt)
+                self.var_inc /= Solver.VAR_DECAY
+                conflicts += 1
+                continue
+
+            if conflicts >= limit:
+                restarts += 1
+                conflicts = 0
+                limit = Solver.RESTART_BASE * luby(restarts + 1)
+                self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            lit = None
+            while self.decision_level() < len(assumptions):
+                p = assumptions[self.decision_level()]
+                if self.value.get(p) is True:
+                    self.trail_lim.append(len(self.trail))
+                elif self.value.get(p) is False:
+                    self.backtrack(0)
+                    return False
+                else:
+                    lit = p
+                    break
+
+            if lit is None:
+                v = self.pick_branch()
+                if v is None:
+                    self.model = {
+                        u: self.value[u] for u in range(1, self.num_vars + 1)
+                    }
+                    return True
+                lit = v if self.polarity[v] else -v
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(lit, None)